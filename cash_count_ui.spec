@@ -10,7 +10,9 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    # The check scanner's OCR stack and pandas' optional extras are never imported by the UI
+    excludes=['torch', 'torchvision', 'transformers', 'easyocr', 'cv2', 'onnxruntime', 'optimum',
+              'matplotlib', 'scipy', 'IPython', 'notebook', 'pytest', 'tkinter.test'],
     noarchive=False,
     optimize=0,
 )
@@ -25,7 +27,7 @@ exe = EXE(
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    upx=False,
     console=False,
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -39,7 +41,7 @@ coll = COLLECT(
     a.binaries,
     a.datas,
     strip=False,
-    upx=True,
+    upx=False,
     upx_exclude=[],
     name='cash_count_ui',
 )
@@ -0,0 +1,95 @@
+## Constrained TrOCR decoding for the handwritten legal-amount line
+# In "numeric" decoding mode every generate step may only continue a word of the amount vocabulary
+# below (or end the text after a complete word), so the output is almost always something
+# parse_amount can convert, and the end token is reached as soon as the amount is written out.
+
+NUMBER_WORDS = [
+    "zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten",
+    "eleven", "twelve", "thirteen", "fourteen", "fifteen", "sixteen", "seventeen", "eighteen", "nineteen",
+    "twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety",
+    "hundred", "thousand", "million",
+]
+CONNECTOR_WORDS = ["and", "dollars", "dollar", "cents", "only"]
+
+# Cents written as a fraction: "25/100", "xx/100", "no/100"
+FRACTION_WORDS = [f"{cents:02d}/100" for cents in range(100)] + ["xx/100", "no/100", "/100"]
+
+# Tokenized vocabularies per tokenizer, built once per process
+_prefix_functions = {}
+
+
+def word_variants(word):
+    """ Spellings of a vocabulary word as handwriting is commonly transcribed: one, One, ONE """
+    return {word, word.capitalize(), word.upper()}
+
+
+def build_trie(token_sequences):
+    """ Builds a token trie: {token id: child node}, where the key None marks the end of a word """
+    trie = {}
+    for tokens in token_sequences:
+        node = trie
+        for token in tokens:
+            node = node.setdefault(token, {})
+        node[None] = True
+    return trie
+
+
+def numeric_prefix_allowed_tokens_fn(tokenizer):
+    """
+    Returns the prefix_allowed_tokens_fn for model.generate that restricts the decoded text to amount words.
+
+    Inputs:
+    - tokenizer (object): The TrOCR processor's tokenizer (processor.tokenizer).
+
+    Outputs:
+    - allowed_tokens (callable): (batch_id, input_ids) -> list of token ids allowed next.
+    """
+    key = id(tokenizer)
+    if key in _prefix_functions:
+        return _prefix_functions[key]
+
+    def encode(text):
+        return tokenizer.encode(text, add_special_tokens=False)
+
+    words = [variant for word in NUMBER_WORDS + CONNECTOR_WORDS for variant in word_variants(word)]
+    # The first word starts the text; later words follow a space, or a hyphen ("twenty-five")
+    first_trie = build_trie([encode(word) for word in words + FRACTION_WORDS])
+    next_trie = build_trie([encode(" " + word) for word in words + FRACTION_WORDS] +
+                           [encode("-" + word) for word in NUMBER_WORDS])
+    eos_token_id = tokenizer.eos_token_id
+    pad_token_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else eos_token_id
+    first_tokens = [token for token in first_trie if token is not None]
+
+    def allowed_tokens(batch_id, input_ids):
+        # Skip the decoder start token, then walk the generated tokens through the tries
+        generated = input_ids.tolist()[1:]
+        if eos_token_id in generated:
+            # Finished sequence; generate pads it
+            return [pad_token_id]
+        node = first_trie
+        for token in generated:
+            if token in node:
+                node = node[token]
+            elif None in node and token in next_trie:
+                # The previous word is complete and this token starts the next one
+                node = next_trie[token]
+            else:
+                return [eos_token_id]
+
+        if not generated:
+            return first_tokens
+        allowed = [token for token in node if token is not None]
+        if None in node:
+            allowed.extend(token for token in next_trie if token is not None)
+            allowed.append(eos_token_id)
+        return allowed or [eos_token_id]
+
+    _prefix_functions[key] = allowed_tokens
+    return allowed_tokens
+
+
+def generate_options(processor, decode="open"):
+    """ Extra keyword arguments for model.generate in the given decoding mode ("open" or "numeric") """
+    if decode == "numeric":
+        return {"prefix_allowed_tokens_fn": numeric_prefix_allowed_tokens_fn(processor.tokenizer)}
+    return {}
@@ -0,0 +1,127 @@
+## Load dependencies
+import pdfplumber
+from stage_trace import span
+
+# Bill denominations the BC-40 counter reports
+DENOMINATIONS = (1, 2, 5, 10, 20, 50, 100)
+
+# Words closer than this (in PDF points) vertically are on the same printed line
+LINE_TOLERANCE = 3
+
+
+class BC40LayoutError(ValueError):
+    """ The page does not have the BC-40 denomination report layout, or its numbers do not add up """
+
+
+def group_lines(words):
+    """ Groups pdfplumber words into printed lines, top to bottom, each line left to right """
+    lines = []
+    for word in sorted(words, key=lambda word: (word["top"], word["x0"])):
+        if lines and abs(lines[-1][0]["top"] - word["top"]) <= LINE_TOLERANCE:
+            lines[-1].append(word)
+        else:
+            lines.append([word])
+    return [sorted(line, key=lambda word: word["x0"]) for line in lines]
+
+
+def parse_int(text):
+    try:
+        return int(text.replace(",", ""))
+    except ValueError:
+        raise BC40LayoutError(f"Expected a number, found {text!r}")
+
+
+def validate_rows(rows, total):
+    """
+    Checks a parsed report: known denominations, each QTY * DENO == AMT, and the TOTAL row equal to
+    the sums of the QTY and AMT columns. Raises BC40LayoutError otherwise.
+    """
+    if not rows:
+        raise BC40LayoutError("No denomination rows found")
+    denominations = [deno for deno, _, _ in rows]
+    if len(set(denominations)) != len(denominations) or not set(denominations) <= set(DENOMINATIONS):
+        raise BC40LayoutError(f"Unexpected denominations {denominations}")
+    for deno, qty, amt in rows:
+        if qty * deno != amt:
+            raise BC40LayoutError(f"{deno} row: QTY {qty} x {deno} != AMT {amt}")
+    if total != (sum(qty for _, qty, _ in rows), sum(amt for _, _, amt in rows)):
+        raise BC40LayoutError(f"TOTAL row {total} does not match the denomination rows")
+
+
+def parse_words(page):
+    """
+    Reads the DENO/QTY/AMT rows and the TOTAL row from the positions of the words on the page.
+
+    The DENO, QTY and AMT header words give the column positions; every following line is split into
+    those columns by the nearest header, up to the TOTAL line.
+
+    Inputs:
+    - page (pdfplumber.page.Page): First page of a BC-40 report.
+
+    Outputs:
+    - rows (list of (int, int, int)): (DENO, QTY, AMT) per denomination, in printed order.
+    - total (tuple of (int, int)): (QTY, AMT) of the TOTAL row.
+    """
+    lines = group_lines(page.extract_words())
+    header_index = next((index for index, line in enumerate(lines)
+                         if {"DENO", "QTY", "AMT"} <= {word["text"] for word in line}), None)
+    if header_index is None:
+        raise BC40LayoutError("No DENO/QTY/AMT header found")
+    centers = {word["text"]: (word["x0"] + word["x1"]) / 2 for word in lines[header_index]
+               if word["text"] in ("DENO", "QTY", "AMT")}
+
+    rows = []
+    for line in lines[header_index + 1:]:
+        columns = {}
+        for word in line:
+            center = (word["x0"] + word["x1"]) / 2
+            column = min(centers, key=lambda name: abs(centers[name] - center))
+            if column in columns:
+                raise BC40LayoutError(f"Two values in the {column} column of line {[w['text'] for w in line]}")
+            columns[column] = word["text"]
+        if set(columns) != {"DENO", "QTY", "AMT"}:
+            raise BC40LayoutError(f"Incomplete line {[word['text'] for word in line]}")
+        if columns["DENO"].upper() == "TOTAL":
+            return rows, (parse_int(columns["QTY"]), parse_int(columns["AMT"]))
+        rows.append((parse_int(columns["DENO"]), parse_int(columns["QTY"]), parse_int(columns["AMT"])))
+    raise BC40LayoutError("No TOTAL row found")
+
+
+def parse_table(page):
+    """ Generic path: pdfplumber's ruled-table extraction, header on the fourth table row; same outputs as parse_words """
+    table = page.extract_table()
+    if not table or len(table) < 6:
+        raise BC40LayoutError("No report table found")
+    header = table[3]
+    deno_col, qty_col, amt_col = (header.index(name) for name in ("DENO", "QTY", "AMT"))
+    rows = [(parse_int(row[deno_col]), parse_int(row[qty_col]), parse_int(row[amt_col])) for row in table[4:-1]]
+    return rows, (parse_int(table[-1][qty_col]), parse_int(table[-1][amt_col]))
+
+
+def read_bc40_report(pdf_path):
+    """
+    Reads a BC-40 denomination report PDF.
+
+    Inputs:
+    - pdf_path (str): The file path of the PDF (single page).
+
+    Outputs:
+    - rows (list of (int, int, int)): (DENO, QTY, AMT) per denomination, sorted by ascending denomination.
+    - total (tuple of (int, int)): (QTY, AMT) of the TOTAL row.
+
+    The page is read from its word positions first; if that layout does not match or does not add up,
+    pdfplumber's generic table extraction is used instead. BC40LayoutError is raised if neither reads
+    a consistent report.
+    """
+    with pdfplumber.open(pdf_path) as pdf:
+        page = pdf.pages[0]  # Only single-page PDFs are expected
+        try:
+            with span("bc40 parse words"):
+                rows, total = parse_words(page)
+                validate_rows(rows, total)
+        except BC40LayoutError as error:
+            print(f"BC-40 layout not recognized ({error}); using the generic table extraction")
+            with span("pdfplumber extract_table"):
+                rows, total = parse_table(page)
+                validate_rows(rows, total)
+    return sorted(rows), total
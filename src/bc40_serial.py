@@ -0,0 +1,396 @@
+## Direct serial-port driver for the BC-40 counter: raw capture, count parsing, a simulated counter on a
+## pseudo-terminal and filling the offering report
+#
+# The counter's wire format is not documented and has not been captured yet. Until it is, parse_line is a
+# placeholder that assumes the counter sends the printed report's lines as CRLF-terminated ASCII text:
+#
+#     DENO QTY AMT
+#     1 23 23
+#     ...
+#     TOTAL 27 43
+#
+# `simulate` and `bench` serve this format (or a capture file) on a pseudo-terminal, so the driver can be tested
+# and timed without the counter. Work order on the real counter:
+#   1. `capture` the bytes the counter sends for a few counts (with their printed reports for reference);
+#   2. `parse` the capture files and adapt parse_line/read_counts until every count matches its printed report;
+#   3. only then use `fill --parser_confirmed` instead of UpperMonitor.
+import argparse
+import os
+import sys
+import threading
+import time
+from datetime import date
+
+from bc40_report import DENOMINATIONS, BC40LayoutError, parse_int, validate_rows
+from stage_trace import span
+
+# UpperMonitor's connection settings
+DEFAULT_PORT = "COM3"
+DEFAULT_BAUDRATE = 115200
+
+HEADER = ("DENO", "QTY", "AMT")
+
+
+def parse_line(line):
+    """
+    Parses one received line (placeholder format, see the top of this file).
+
+    Inputs:
+    - line (str): A line without its line ending.
+
+    Outputs:
+    - ("header", None), ("row", (DENO, QTY, AMT)) or ("total", (QTY, AMT)); (None, None) for any other line.
+    """
+    fields = line.replace("\t", " ").split()
+    if tuple(field.upper() for field in fields) == HEADER:
+        return "header", None
+    if len(fields) != 3:
+        return None, None
+    if fields[0].upper() == "TOTAL":
+        return "total", (parse_int(fields[1]), parse_int(fields[2]))
+    return "row", (parse_int(fields[0]), parse_int(fields[1]), parse_int(fields[2]))
+
+
+def format_report(rows):
+    """ The lines the counter is assumed to send for a count of (DENO, QTY, AMT) rows, TOTAL line included """
+    lines = [" ".join(HEADER)]
+    lines += [f"{deno} {qty} {amt}" for deno, qty, amt in rows]
+    lines.append(f"TOTAL {sum(qty for _, qty, _ in rows)} {sum(amt for _, _, amt in rows)}")
+    return "".join(line + "\r\n" for line in lines).encode("ascii")
+
+
+class CaptureFile:
+    """ A raw capture file read back like a serial port (readline, port name); EOFError at its end """
+
+    def __init__(self, path):
+        self.port = path
+        self.file = open(path, "rb")
+
+    def readline(self):
+        line = self.file.readline()
+        if not line:
+            raise EOFError(f"End of capture {self.port}")
+        return line
+
+    def close(self):
+        self.file.close()
+
+
+class BC40Serial:
+    """
+    Connection to the BC-40 counter's serial port, or a CaptureFile standing in for it.
+
+    read_counts() yields each denomination row as soon as its line arrives; read_report() collects a whole
+    count as (rows, total), checked the same way as a parsed PDF report, ready for cash_report.process_counts.
+    With raw_log, every byte received is also appended to that file (a capture for `parse` and `replay`).
+    """
+
+    def __init__(self, port=DEFAULT_PORT, baudrate=DEFAULT_BAUDRATE, timeout=1.0, raw_log=None):
+        if isinstance(port, CaptureFile):
+            self.port = port
+        else:
+            import serial
+
+            # timeout (seconds) bounds each read, so a wait for the next count can be given up
+            self.port = serial.Serial(port, baudrate, timeout=timeout)
+        self.raw_log = open(raw_log, "ab") if raw_log else None
+        self.total = None
+        # Part of a line received before a read timed out
+        self.pending = b""
+
+    def read_line(self, deadline):
+        """ The next line as text, or None once deadline (time.monotonic(), or None for never) has passed """
+        while deadline is None or time.monotonic() < deadline:
+            received = self.port.readline()
+            if received and self.raw_log is not None:
+                self.raw_log.write(received)
+                self.raw_log.flush()
+            self.pending += received
+            if self.pending.endswith(b"\n"):
+                line, self.pending = self.pending, b""
+                return line.decode("ascii", errors="replace").strip()
+        return None
+
+    def read_counts(self, timeout=None):
+        """
+        Yields (DENO, QTY, AMT) for each denomination of the next count, as the counter sends them.
+        The count's TOTAL line is kept in self.total. Raises TimeoutError if no complete count arrives
+        within timeout seconds (None waits for the operator indefinitely), and BC40LayoutError on a
+        malformed report line.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self.total = None
+        in_report = False
+        while True:
+            line = self.read_line(deadline)
+            if line is None:
+                raise TimeoutError(f"No complete count from the counter on {self.port.port}")
+            try:
+                kind, value = parse_line(line)
+            except BC40LayoutError:
+                if not in_report:
+                    continue  # Status messages between counts
+                raise
+            if kind == "header":
+                in_report = True
+            elif in_report and kind == "row":
+                yield value
+            elif in_report and kind == "total":
+                self.total = value
+                return
+
+    def read_report(self, timeout=None):
+        """ Reads the next count; returns (rows sorted by denomination, (QTY, AMT) total), like read_bc40_report """
+        with span("bc40 serial read"):
+            rows = list(self.read_counts(timeout))
+        validate_rows(rows, self.total)
+        return sorted(rows), self.total
+
+    def close(self):
+        self.port.close()
+        if self.raw_log is not None:
+            self.raw_log.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def capture(port, baudrate, output_file, seconds=None):
+    """ Appends the raw bytes received on the port to output_file, echoing them, until Ctrl+C or seconds pass """
+    import serial
+
+    end = None if seconds is None else time.monotonic() + seconds
+    with serial.Serial(port, baudrate, timeout=0.5) as connection, open(output_file, "ab") as output:
+        try:
+            while end is None or time.monotonic() < end:
+                received = connection.read(connection.in_waiting or 1)
+                if received:
+                    output.write(received)
+                    output.flush()
+                    print(repr(received))
+        except KeyboardInterrupt:
+            pass
+
+
+def fill_report(counter, mass, offering, mass_date, report_folder, template_path, ledger=None, timeout=None):
+    """
+    Reads the next count from the counter and fills it into the mass's offering report, like the UI does with
+    the counter's PDF; the report is saved right away. Returns the report path.
+    """
+    from cash_report import process_counts, report_path
+    from report_session import ReportSession
+
+    rows, total = counter.read_report(timeout)
+    output_file = report_path(report_folder, mass_date, mass)
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    session = ReportSession(output_file, template_path)
+    process_counts(rows, total, session, is_second_offering=offering == 2, mass_time=mass,
+                   populate_header=offering == 1, mass_date=mass_date, ledger=ledger,
+                   source=f"serial:{counter.port.port}")
+    session.save()
+    if ledger is not None:
+        from giving_rollups import update_rollups
+
+        update_rollups(ledger)
+    return output_file
+
+
+class BC40Simulator:
+    """
+    A simulated counter on a pseudo-terminal (Linux and macOS), for testing and timing the driver without
+    the counter. Open BC40Serial(simulator.port_name), then send_count() counts in the assumed line format,
+    or send() the bytes of a capture file.
+    """
+
+    def __init__(self):
+        import tty
+        self.master_fd, self.slave_fd = os.openpty()
+        # Raw mode, so line endings and bytes reach the driver unchanged
+        tty.setraw(self.slave_fd)
+        self.port_name = os.ttyname(self.slave_fd)
+        self.lock = threading.Lock()
+
+    def send(self, data, chunk_size=None, delay=0):
+        """ Writes bytes to the driver, optionally in chunks with a delay between them, like a slow line """
+        with self.lock:
+            chunk_size = chunk_size or len(data)
+            for start in range(0, len(data), chunk_size):
+                os.write(self.master_fd, data[start:start + chunk_size])
+                if delay:
+                    time.sleep(delay)
+
+    def send_count(self, rows, chunk_size=None, delay=0):
+        """ Sends one count's report for (DENO, QTY, AMT) rows """
+        self.send(format_report(rows), chunk_size, delay)
+
+    def close(self):
+        os.close(self.master_fd)
+        os.close(self.slave_fd)
+
+
+def sample_count(index):
+    """ A varying, consistent count for simulations; every denomination is listed, like the printed report """
+    return [(deno, qty, deno * qty) for deno, qty in zip(DENOMINATIONS, ((index * 7 + 3 * step) % 40 for step in range(1, 8)))]
+
+
+def bench_counts(counts, chunk_size=None):
+    """ Reads simulated counts through the driver, checking each; returns the read time of every count (ms) """
+    simulator = BC40Simulator()
+    timings = []
+    try:
+        with BC40Serial(simulator.port_name, timeout=0.5) as counter:
+            for index in range(counts):
+                rows = sample_count(index)
+                start = time.perf_counter()
+                sender = threading.Thread(target=simulator.send_count, args=(rows, chunk_size))
+                sender.start()
+                received, _ = counter.read_report(timeout=5)
+                timings.append((time.perf_counter() - start) * 1000)
+                sender.join()
+                if received != sorted(rows):
+                    raise BC40LayoutError(f"Count {index}: sent {rows}, received {received}")
+    finally:
+        simulator.close()
+    return timings
+
+
+def bench_capture(capture_file, chunk_size=None, idle_timeout=1.0):
+    """
+    Sends a capture file through the simulated counter; returns (counts read, ms from the start until the last
+    count was read). Reading stops once no further count arrives within idle_timeout seconds.
+    """
+    with open(capture_file, "rb") as capture_data:
+        data = capture_data.read()
+    simulator = BC40Simulator()
+    counts = 0
+    try:
+        with BC40Serial(simulator.port_name, timeout=0.1) as counter:
+            sender = threading.Thread(target=simulator.send, args=(data, chunk_size))
+            start = last_count = time.perf_counter()
+            sender.start()
+            try:
+                while True:
+                    counter.read_report(timeout=idle_timeout)
+                    counts += 1
+                    last_count = time.perf_counter()
+            except TimeoutError:
+                pass
+            sender.join()
+    finally:
+        simulator.close()
+    return counts, (last_count - start) * 1000
+
+
+def print_report(rows, total):
+    for deno, qty, amt in rows:
+        print(f"{deno:>5}{qty:>6}{amt:>8}")
+    print(f"{'TOTAL':>5}{total[0]:>6}{total[1]:>8}")
+
+
+## Execution
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Capture, parse and read BC-40 counts from its serial port, or simulate the counter")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    capture_parser = subparsers.add_parser("capture", help="record the raw bytes the counter sends")
+    capture_parser.add_argument('output', help='capture file (appended to)')
+    capture_parser.add_argument('--seconds', type=float, default=None, help='stop after this long (default: Ctrl+C)')
+
+    parse_parser = subparsers.add_parser("parse", help="parse the counts in capture files")
+    parse_parser.add_argument('captures', nargs='+', metavar='capture')
+
+    read_parser = subparsers.add_parser("read", help="print the next counts from the counter")
+    read_parser.add_argument('--counts', type=int, default=1, help='number of counts to read')
+
+    fill_parser = subparsers.add_parser("fill", help="read the next count into the mass's offering report")
+    fill_parser.add_argument('--mass', required=True, help='mass time, e.g., 9시')
+    fill_parser.add_argument('--offering', type=int, default=1, choices=[1, 2])
+    fill_parser.add_argument('--date', default=None, metavar='YYYY-MM-DD', help='mass date (default: today)')
+    fill_parser.add_argument('--report_folder', default=None, help='default: cash_report.REPORT_FOLDER')
+    fill_parser.add_argument('--template', default=None, help='default: cash_report.TEMPLATE_PATH')
+
+    fill_parser.add_argument('--parser_confirmed', action='store_true',
+                             help='parse_line has been checked against captures of the real counter (required)')
+
+    simulate_parser = subparsers.add_parser("simulate", help="run a simulated counter on a pseudo-terminal (Linux/macOS)")
+    simulate_parser.add_argument('--capture', metavar='file', default=None, help='send this capture instead of generated counts')
+    simulate_parser.add_argument('--interval', type=float, default=5.0, help='seconds between generated counts')
+
+    bench_parser = subparsers.add_parser("bench", help="time the driver against the simulated counter (Linux/macOS)")
+    bench_parser.add_argument('--counts', type=int, default=100, help='number of generated counts')
+    bench_parser.add_argument('--capture', metavar='file', default=None, help='send this capture instead of generated counts')
+    bench_parser.add_argument('--chunk_size', type=int, default=None, help='bytes per write, to mimic a slow line')
+
+    for command_parser in (capture_parser, read_parser, fill_parser):
+        command_parser.add_argument('--port', default=DEFAULT_PORT, help='serial port of the counter (e.g., COM3, /dev/ttyUSB0)')
+        command_parser.add_argument('--baudrate', type=int, default=DEFAULT_BAUDRATE)
+    for command_parser in (read_parser, fill_parser):
+        command_parser.add_argument('--raw_log', metavar='file', default=None, help='also append the raw bytes received to this capture file')
+    from ledger import add_ledger_arguments, open_ledger
+    add_ledger_arguments(fill_parser)
+    args = parser.parse_args()
+
+    if args.command == "capture":
+        print(f"Capturing {args.port} at {args.baudrate} baud into {args.output} (Ctrl+C to stop)")
+        capture(args.port, args.baudrate, args.output, args.seconds)
+    elif args.command == "parse":
+        for capture_file in args.captures:
+            print(f"== {capture_file}")
+            with BC40Serial(CaptureFile(capture_file)) as counter:
+                try:
+                    while True:
+                        print_report(*counter.read_report())
+                except EOFError:
+                    pass
+                except BC40LayoutError as error:
+                    print(f"Not understood: {error}")
+                    sys.exit(1)
+    elif args.command == "read":
+        with BC40Serial(args.port, args.baudrate, raw_log=args.raw_log) as counter:
+            for _ in range(args.counts):
+                print_report(*counter.read_report())
+    elif args.command == "fill":
+        if not args.parser_confirmed:
+            parser.error("parse_line is still a placeholder; check it with `parse` on captures of the real counter, "
+                         "then run fill with --parser_confirmed")
+        import cash_report
+
+        ledger = open_ledger(args)
+        mass_date = date.fromisoformat(args.date) if args.date else date.today()
+        with BC40Serial(args.port, args.baudrate, raw_log=args.raw_log) as counter:
+            print(f"Waiting for the {args.offering}차 count of the {args.mass} mass on {args.port}...")
+            output_file = fill_report(counter, args.mass, args.offering, mass_date,
+                                      args.report_folder or cash_report.REPORT_FOLDER,
+                                      args.template or cash_report.TEMPLATE_PATH, ledger)
+        if ledger is not None:
+            ledger.close()
+        print(f"Report written: {output_file}")
+    elif args.command == "simulate":
+        simulator = BC40Simulator()
+        print(f"Simulated BC-40 on {simulator.port_name} (Ctrl+C to stop)")
+        try:
+            if args.capture:
+                with open(args.capture, "rb") as capture_data:
+                    simulator.send(capture_data.read())
+                print(f"Sent {args.capture}")
+                while True:
+                    time.sleep(1)
+            index = 0
+            while True:
+                time.sleep(args.interval)
+                simulator.send_count(sample_count(index))
+                index += 1
+        except KeyboardInterrupt:
+            pass
+        finally:
+            simulator.close()
+    elif args.capture:
+        counts, elapsed_ms = bench_capture(args.capture, args.chunk_size)
+        print(f"{counts} counts read from {args.capture} in {elapsed_ms:.1f} ms")
+    else:
+        timings = sorted(bench_counts(args.counts, args.chunk_size))
+        print(f"{args.counts} counts read over a pseudo-terminal: median {timings[len(timings) // 2]:.2f} ms, "
+              f"max {timings[-1]:.2f} ms per count")
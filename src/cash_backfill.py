@@ -0,0 +1,213 @@
+## Headless backfill: rebuilds the offering reports of past masses from their BC-40 PDFs
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime
+from cash_report import REPORT_FOLDER, TEMPLATE_PATH, process_pdf, report_path
+from report_session import ReportSession
+from ledger import Ledger, add_ledger_arguments
+from giving_rollups import update_rollups
+
+MANIFEST_NAME = "backfill_manifest.json"
+
+
+def read_mapping(mapping_file, start_date, end_date):
+    """
+    Reads the PDF mapping and groups it into one job per mass.
+
+    Inputs:
+    - mapping_file (str): CSV file with the columns date (YYYY-MM-DD), mass (e.g., 9시), offering (1 or 2) and pdf.
+    - start_date, end_date (datetime.date): Inclusive date range; other rows are ignored.
+
+    Outputs:
+    - jobs (list of dict): {"date": "YYYY-MM-DD", "mass": ..., "pdfs": {"1": path, "2": path}} per mass, by date and mass.
+    """
+    masses = {}
+    with open(mapping_file, newline="", encoding="utf-8-sig") as mapping:
+        for line_number, row in enumerate(csv.DictReader(mapping), start=2):
+            mass_date = datetime.strptime(row["date"].strip(), "%Y-%m-%d").date()
+            if not start_date <= mass_date <= end_date:
+                continue
+            offering = row["offering"].strip()
+            if offering not in ("1", "2"):
+                raise ValueError(f"{mapping_file} line {line_number}: offering must be 1 or 2, not {offering!r}")
+            job = masses.setdefault((mass_date.isoformat(), row["mass"].strip()),
+                                    {"date": mass_date.isoformat(), "mass": row["mass"].strip(), "pdfs": {}})
+            if offering in job["pdfs"]:
+                raise ValueError(f"{mapping_file} line {line_number}: offering {offering} of {job['date']} {job['mass']} is mapped twice")
+            job["pdfs"][offering] = row["pdf"].strip()
+
+    for job in masses.values():
+        if "1" not in job["pdfs"]:
+            raise ValueError(f"{job['date']} {job['mass']}: a second offering without a first offering")
+    return [masses[key] for key in sorted(masses)]
+
+
+def input_signature(job, template_path):
+    """ (size, mtime_ns) of every file a report is built from, to tell whether its output is up to date """
+    paths = [template_path] + [job["pdfs"][offering] for offering in sorted(job["pdfs"])]
+    signature = {}
+    for path in paths:
+        stat = os.stat(path)
+        signature[path] = [stat.st_size, stat.st_mtime_ns]
+    return signature
+
+
+def is_up_to_date(entry, output_file, signature):
+    """ True if the manifest entry built output_file from exactly these inputs and the file was not changed since """
+    if entry is None or entry.get("status") != "ok" or not os.path.exists(output_file):
+        return False
+    return entry["inputs"] == signature and entry["output_mtime_ns"] == os.stat(output_file).st_mtime_ns
+
+
+def build_report(job, report_folder, template_path, ledger_file=None):
+    """
+    Builds one mass's report from the template: the first offering with the header, then the second offering,
+    recording the counts in the ledger file if given. Runs in the worker processes; returns the manifest entry of the report.
+    """
+    build_start = time.perf_counter()
+    mass_date = date.fromisoformat(job["date"])
+    output_file = report_path(report_folder, mass_date, job["mass"])
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+
+    session = ReportSession(output_file, template_path, fresh=True)
+    ledger = Ledger(ledger_file) if ledger_file else None
+    try:
+        for offering in sorted(job["pdfs"]):
+            process_pdf(job["pdfs"][offering], session, is_second_offering=offering == "2", mass_time=job["mass"],
+                        populate_header=offering == "1", mass_date=mass_date, ledger=ledger)
+    finally:
+        if ledger is not None:
+            ledger.close()
+    session.save()
+
+    return {
+        "date": job["date"],
+        "mass": job["mass"],
+        "pdfs": job["pdfs"],
+        "status": "ok",
+        "inputs": input_signature(job, template_path),
+        "output_mtime_ns": os.stat(output_file).st_mtime_ns,
+        "seconds": time.perf_counter() - build_start,
+        "built_at": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def load_manifest(manifest_file):
+    if not os.path.exists(manifest_file):
+        return {}
+    with open(manifest_file, encoding="utf-8") as manifest:
+        return json.load(manifest)
+
+
+def save_manifest(manifest, manifest_file):
+    """ Writes the manifest through a temporary file, so an interrupted run keeps the previous one """
+    temp_file = manifest_file + ".tmp"
+    with open(temp_file, "w", encoding="utf-8") as manifest_out:
+        json.dump(manifest, manifest_out, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(temp_file, manifest_file)
+
+
+def backfill(jobs, report_folder=REPORT_FOLDER, template_path=TEMPLATE_PATH, manifest_file=None, workers=1, force=False,
+             ledger_file=None):
+    """
+    Builds the reports of the given masses, skipping the ones whose report is up to date.
+
+    Inputs:
+    - jobs (list of dict): Masses from read_mapping.
+    - report_folder (str): Folder receiving the <MM-DD-YYYY> report folders.
+    - template_path (str): Offering report template.
+    - manifest_file (str or None): JSON manifest of the reports built (default <report_folder>/backfill_manifest.json);
+      it records the inputs of every report, which is how up-to-date reports are recognized.
+    - workers (int): Number of worker processes.
+    - force (bool): Rebuild every report, even when it is up to date.
+    - ledger_file (str or None): Ledger to record the counts of the rebuilt reports in.
+
+    Outputs:
+    - counts (dict): Number of reports "built", "skipped" (up to date) and "failed".
+    """
+    manifest_file = manifest_file or os.path.join(report_folder, MANIFEST_NAME)
+    manifest = load_manifest(manifest_file)
+    counts = {"built": 0, "skipped": 0, "failed": 0}
+
+    pending = []
+    for job in jobs:
+        output_file = report_path(report_folder, date.fromisoformat(job["date"]), job["mass"])
+        try:
+            signature = input_signature(job, template_path)
+        except FileNotFoundError as error:
+            print(f"{job['date']} {job['mass']}: missing input {error.filename}")
+            manifest[output_file] = {"date": job["date"], "mass": job["mass"], "pdfs": job["pdfs"],
+                                     "status": f"error: missing input {error.filename}"}
+            counts["failed"] += 1
+            continue
+        if not force and is_up_to_date(manifest.get(output_file), output_file, signature):
+            counts["skipped"] += 1
+            continue
+        pending.append((output_file, job))
+
+    def record(output_file, job, entry=None, error=None):
+        if error is None:
+            counts["built"] += 1
+            print(f"{job['date']} {job['mass']}: {os.path.basename(output_file)} ({entry['seconds']:.2f}s)")
+        else:
+            counts["failed"] += 1
+            entry = {"date": job["date"], "mass": job["mass"], "pdfs": job["pdfs"], "status": f"error: {error}"}
+            print(f"{job['date']} {job['mass']}: failed - {error}")
+        manifest[output_file] = entry
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(build_report, job, report_folder, template_path, ledger_file): (output_file, job)
+                       for output_file, job in pending}
+            for future in as_completed(futures):
+                output_file, job = futures[future]
+                try:
+                    record(output_file, job, future.result())
+                except Exception as error:
+                    record(output_file, job, error=error)
+    else:
+        for output_file, job in pending:
+            try:
+                record(output_file, job, build_report(job, report_folder, template_path, ledger_file))
+            except Exception as error:
+                record(output_file, job, error=error)
+
+    os.makedirs(os.path.dirname(os.path.abspath(manifest_file)), exist_ok=True)
+    save_manifest(manifest, manifest_file)
+    return counts
+
+
+## Execution
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild offering reports of past masses from their BC-40 PDFs")
+    parser.add_argument('--mapping', metavar='file', required=True, help='CSV with the columns date (YYYY-MM-DD), mass, offering (1/2), pdf')
+    parser.add_argument('--start', metavar='YYYY-MM-DD', required=True, help='first mass date')
+    parser.add_argument('--end', metavar='YYYY-MM-DD', default=None, help='last mass date (default: --start)')
+    parser.add_argument('--report_folder', metavar='path', default=REPORT_FOLDER, help='folder receiving the report folders')
+    parser.add_argument('--template', metavar='file', default=TEMPLATE_PATH, help='offering report template')
+    parser.add_argument('--manifest', metavar='file', default=None, help=f'manifest file (default: <report_folder>/{MANIFEST_NAME})')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='number of worker processes')
+    parser.add_argument('--force', action='store_true', help='rebuild reports that are already up to date')
+    add_ledger_arguments(parser)
+    args = parser.parse_args()
+
+    start_date = date.fromisoformat(args.start)
+    end_date = date.fromisoformat(args.end) if args.end else start_date
+    jobs = read_mapping(args.mapping, start_date, end_date)
+    print(f"{len(jobs)} masses between {start_date} and {end_date}")
+
+    run_start = time.perf_counter()
+    counts = backfill(jobs, args.report_folder, args.template, args.manifest, args.workers, args.force,
+                      None if args.no_ledger else args.ledger)
+    print(f"Built {counts['built']}, up to date {counts['skipped']}, failed {counts['failed']} "
+          f"in {time.perf_counter() - run_start:.1f}s")
+    if counts["built"] and not args.no_ledger:
+        ledger = Ledger(args.ledger)
+        update_rollups(ledger)
+        ledger.close()
+    sys.exit(1 if counts["failed"] else 0)
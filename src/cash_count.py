@@ -6,35 +6,9 @@ import os
 import time
 from datetime import datetime
 import glob
-import pdfplumber
-import pandas as pd 
 from openpyxl import load_workbook
 import sys
-
-# Function to transform the PDf to a Dataframe 
-def pdf_to_dataframe(pdf_path):
-    """
-    Extracts table data from a single-page PDF and returns it as a pandas DataFrame.
-
-    Parameters:
-    pdf_path (str): The file path of the PDF.
-
-    Returns:
-    pd.DataFrame: A DataFrame containing the extracted table data.
-    """
-    # Initialize an empty DataFrame
-    df = pd.DataFrame()
-
-    # Load the PDF and extract table data from the first page
-    with pdfplumber.open(pdf_path) as pdf:
-        page = pdf.pages[0]  # Only single-page PDFs are expected
-        table = page.extract_table()
-
-        # Check if there is a table and convert it to DataFrame
-        if table:
-            df = pd.DataFrame(table[4:], columns=table[3])  # First row as header
-
-    return df
+from cash_tally import read_tally
 
 # Step 1: Launch the Upper Monitor Application and Set Parameters
 def launch_app(app_path):
@@ -78,27 +52,12 @@ def find_latest_pdf(data_folder, date_str):
 
 # Step 3: Process the PDF and save as CSV 
 def process_pdf(pdf_file, output_dir):
-    df = pdf_to_dataframe(pdf_file)
-    df = df[:-1]
-    df['DENO'] = df['DENO'].astype(int)
-    df['AMT'] = df['AMT'].astype(int)
-    df['QTY'] = df['QTY'].astype(int)
-    df = df.sort_values(by='DENO', ascending=True)
-
-    df.rename(columns={
-        'AMT': 'Amount'
-    }, inplace=True)
-
-    df.reset_index(inplace=True, drop=True)
-    df.drop(columns='DENO', inplace=True)
+    tally = read_tally(pdf_file)
 
     # Fill-in the processed data to the formatted excel file 
     workbook = load_workbook(output_dir)
     sheet = workbook.active 
-
-    for row_idx, row in enumerate(df.itertuples(index=False), start=2): 
-        for col_idx, value in enumerate(row, start=1):
-            sheet.cell(row=row_idx+5, column=col_idx+2, value=value)
+    tally.write(sheet, offering=1)
 
     workbook.save(output_dir)
 
@@ -2,157 +2,296 @@ import tkinter as tk
 from tkinter import messagebox
 import os
 import time
-import pyautogui
 from datetime import datetime
 import glob
-import pdfplumber
-import pandas as pd
-from openpyxl import load_workbook
 import subprocess
+import queue
+import threading
+import traceback
+import stage_trace
+from stage_trace import span
+from folder_watch import FolderWatcher
 
-def pdf_to_dataframe(pdf_path):
-    """ Extracts table data from a single-page PDF and returns it as a pandas DataFrame. """
-    df = pd.DataFrame()
-    with pdfplumber.open(pdf_path) as pdf:
-        page = pdf.pages[0]
-        table = page.extract_table()
-        if table:
-            df = pd.DataFrame(table[4:], columns=table[3])
-    return df
+# pyautogui and the report modules (pdfplumber, openpyxl) are imported where they are used, so the window
+# comes up without them; preload_modules loads them in the background once it is shown. pandas is only
+# imported by the giving rollups update, which runs after a report is saved
 
+# Set to a file path, the application writes that file once its window is shown and exits (startup timing,
+# see utils/bench_startup.py)
+READY_FILE_ENV = "OFFERING_READY_FILE"
 
-def find_latest_pdf(data_folder, date_str):
-    """ Finds the latest PDF file in the specified directory """
+# Folder the BC-40 UpperMonitor writes its report PDFs to, one subfolder per day (YYYYMMDD)
+DATA_FOLDER = "E:\\CashCounting\\BC-40 UpperMonitor v13\\Release\\Data"
+
+# How often the day's folder is checked for the counter's new PDF
+PDF_POLL_MS = 500
+
+
+def find_latest_pdf(data_folder, date_str, known=()):
+    """ Finds the latest PDF file in the specified directory whose name is not in known (None if there is none) """
     directory_path = os.path.join(data_folder, date_str)
-    pdf_files = glob.glob(os.path.join(directory_path, "*.pdf"))
+    pdf_files = [path for path in glob.glob(os.path.join(directory_path, "*.pdf")) if os.path.basename(path) not in known]
     if not pdf_files:
-        messagebox.showerror("Error", "No PDF files found in the directory.")
         return None
     latest_pdf = max(pdf_files, key=os.path.getctime)
     return latest_pdf
 
 
-def process_pdf(pdf_file, output_dir, is_second_offering=False, mass_time=None, populate_header=False):
-    """ Processes the PDF and saves formatted data to an Excel file """
-    df = pdf_to_dataframe(pdf_file)
-    df = df[:-1]
-    df['DENO'] = df['DENO'].astype(int)
-    df['AMT'] = df['AMT'].astype(int)
-    df['QTY'] = df['QTY'].astype(int)
-    df = df.sort_values(by='DENO', ascending=True)
-    df.rename(columns={'AMT': 'Amount'}, inplace=True)
-    df.reset_index(inplace=True, drop=True)
-    df.drop(columns='DENO', inplace=True)
+def open_output_directory(output_folder):
+    """ Opens the folder where the processed file is saved """
+    subprocess.Popen(f'explorer "{output_folder}"', shell=True)
+
+
+class ReportError(Exception):
+    """ A report cannot be made; the message is shown to the operator """
+
+
+def build_cash_report(is_second_offering, pdf_file, mass_time, has_second_offering):
+    """
+    Worker thread: fills one offering's PDF into the mass's report and saves the report after its last offering.
+    Returns the report folder.
+    """
+    global report_session, ledger
+    from cash_report import REPORT_FOLDER, TEMPLATE_PATH, process_pdf, report_path
+    from report_session import ReportSession
+    from ledger import Ledger
     
-    workbook = load_workbook(output_dir)
-    sheet = workbook.active 
+    offering_type = "2차" if is_second_offering else "1차"
+    show_progress(f"{offering_type} 헌금 PDF 처리 중: {os.path.basename(pdf_file)}")
+    output_dir = report_path(REPORT_FOLDER, datetime.today(), mass_time)
+    output_folder = os.path.dirname(output_dir)
+    os.makedirs(output_folder, exist_ok=True)
     
-    # Populate date and time if this is the first time
-    if populate_header and mass_time:
-        current_date = datetime.today()
-        mass_date = current_date.strftime("%m/%d/%y")
-        sheet.cell(row=3, column=4, value=mass_date)
-        sheet.cell(row=3, column=6, value=mass_time)
+    # The second offering is filled into the workbook the first offering left in memory; after a
+    # restart, the report file saved for the first offering is opened instead
+    if is_second_offering and (report_session is None or report_session.report_path != output_dir):
+        if not os.path.exists(output_dir):
+            raise ReportError("첫 번째 헌금 보고서 파일을 찾을 수 없습니다. 먼저 1차 헌금을 처리하십시오.")
+        report_session = ReportSession(output_dir, TEMPLATE_PATH)
     
-    # First offering: columns C-D (col_idx 3-4), starting at row 7
-    # Second offering: columns E-F (col_idx 5-6), starting at row 7
-    # Both use the same row offset (5), but different column offsets
-    row_offset = 5
-    col_offset = 2 if not is_second_offering else 4  # First offering: +2, Second offering: +4
+    # The first offering starts from the template (or from the report, if this mass was already processed)
+    if not is_second_offering:
+        if not os.path.exists(output_dir) and not os.path.exists(TEMPLATE_PATH):
+            raise ReportError("헌금보고서 양식 파일을 찾을 수 없습니다.")
+        # Another mass whose second offering was never counted keeps its first offering
+        if report_session is not None and report_session.unsaved and report_session.report_path != output_dir:
+            report_session.save()
+        report_session = ReportSession(output_dir, TEMPLATE_PATH)
     
-    for row_idx, row in enumerate(df.itertuples(index=False), start=2):
-        for col_idx, value in enumerate(row, start=1):
-            sheet.cell(row=row_idx+row_offset, column=col_idx+col_offset, value=value)
+    # The ledger's SQLite connection belongs to this thread
+    if ledger is None:
+        ledger = Ledger()
+    with span("process_pdf", offering=2 if is_second_offering else 1, mass=mass_time):
+        process_pdf(pdf_file, report_session, is_second_offering, mass_time, not is_second_offering, ledger=ledger)
     
-    workbook.save(output_dir)
+    # The report is written once per mass: after the second offering, or after the first if there is none
+    if is_second_offering or not has_second_offering:
+        show_progress(f"헌금보고서 저장 중: {os.path.basename(output_dir)}")
+        report_session.save()
+        report_session = None
+        # The rollups (pandas) are brought up to date after the report, as their own job
+        submit_job(update_ledger_rollups, on_error=show_rollup_error)
+    stage_trace.finish()
+    show_progress(f"{offering_type} 헌금 처리 완료")
+    return output_folder
 
 
-def open_output_directory(output_folder):
-    """ Opens the folder where the processed file is saved """
-    subprocess.Popen(f'explorer "{output_folder}"', shell=True)
+def update_ledger_rollups():
+    """ Worker thread: updates the giving rollups with the counts recorded in the ledger """
+    from giving_rollups import update_rollups
+
+    with span("rollups update"):
+        update_rollups(ledger)
+    stage_trace.finish()
 
 
-def process_cash_count_data(is_second_offering=False):
-    """ Executes the full process of locating and processing the PDF """
-    cash_run_date = datetime.today().strftime("%Y%m%d")
-    data_folder = "E:\\CashCounting\\BC-40 UpperMonitor v13\\Release\\Data"
-    pdf_file = find_latest_pdf(data_folder, cash_run_date)
+def show_rollup_error(error):
+    """ The report is saved; a failed rollup update is only noted (the next update catches up) """
+    status_var.set(f"헌금 집계 업데이트 실패: {error}")
+
+
+def save_pending_report():
+    """ Worker thread: saves a first offering still waiting for its second offering """
+    if report_session is not None and report_session.unsaved:
+        report_session.save()
+
+
+def process_cash_count_data(is_second_offering, pdf_file):
+    """
+    Processes the offering's PDF (found by the watcher, or on confirmation) on the worker thread. When a second offering follows, its counting starts right away, while the
+    first offering is still being processed.
+    """
+    mass_time = mass_time_var.get()
+    has_second_offering = has_second_offering_var.get()
+    follows_second = not is_second_offering and has_second_offering
     
-    if pdf_file:
-        run_date = datetime.today().strftime("%m-%d-%Y")
-        output_folder = os.path.join("E:\\헌금보고서", run_date)
-        os.makedirs(output_folder, exist_ok=True)
-        output_dir = os.path.join(output_folder, f'헌금보고서_{run_date}_{mass_time_var.get()}미사.xlsx')
-        
-        # If it's the second offering, the file should already exist from the first offering
-        if is_second_offering and not os.path.exists(output_dir):
-            messagebox.showerror("Error", "첫 번째 헌금 보고서 파일을 찾을 수 없습니다. 먼저 1차 헌금을 처리하십시오.")
+    def on_done(output_folder):
+        if follows_second:
+            # The operator is already counting the second offering
             return
-        
-        # If it's the first offering and the file doesn't exist, copy the template
-        if not is_second_offering and not os.path.exists(output_dir):
-            template_path = "E:\\헌금보고서\\헌금보고서_양식.xlsx"
-            if os.path.exists(template_path):
-                import shutil
-                shutil.copy(template_path, output_dir)
-        
-        process_pdf(pdf_file, output_dir, is_second_offering, mass_time_var.get(), not is_second_offering)
-        
-        offering_type = "2차" if is_second_offering else "1차"
-        success_message = f"{offering_type} 헌금 현금 부분의 헌금보고서 생성이 완료됐습니다."
-        
-        success_win = tk.Toplevel(root)
-        success_win.title("Success")
-        success_win.geometry("600x300")
-        success_label = tk.Label(success_win, text=success_message, font=("Arial", 18, "bold"), wraplength=550)
-        success_label.pack(pady=30)
-        
-        # After first offering, check if second offering is needed
-        if not is_second_offering and has_second_offering_var.get():
-            continue_button = tk.Button(
-                success_win, 
-                text="2차 헌금 카운팅 시작", 
-                command=lambda: [success_win.destroy(), start_second_offering()], 
-                font=("Arial", 16, "bold"),
-                width=20,
-                height=2,
-                bg="#4CAF50",
-                fg="white",
-                cursor="hand2"
-            )
-            continue_button.pack(pady=20)
+        show_report_done(is_second_offering, output_folder)
+    
+    submit_job(build_cash_report, (is_second_offering, pdf_file, mass_time, has_second_offering), on_done)
+    if follows_second:
+        start_second_offering()
+
+
+def show_report_done(is_second_offering, output_folder):
+    """ Shows the completion window of the mass's report """
+    offering_type = "2차" if is_second_offering else "1차"
+    success_message = f"{offering_type} 헌금 현금 부분의 헌금보고서 생성이 완료됐습니다."
+    
+    success_win = tk.Toplevel(root)
+    success_win.title("Success")
+    success_win.geometry("600x300")
+    success_label = tk.Label(success_win, text=success_message, font=("Arial", 18, "bold"), wraplength=550)
+    success_label.pack(pady=30)
+    
+    # Final completion - show option to open directory
+    open_dir_button = tk.Button(
+        success_win, 
+        text="보고서 폴더 열기", 
+        command=lambda: open_output_directory(output_folder), 
+        font=("Arial", 16, "bold"),
+        width=20,
+        height=2,
+        bg="#2196F3",
+        fg="white",
+        cursor="hand2"
+    )
+    open_dir_button.pack(pady=20)
+
+
+def preload_modules():
+    """ Imports the modules the counting steps need while the operator is still choosing the mass """
+    import pyautogui
+    import cash_report
+    import report_session
+
+
+def signal_ready(ready_file):
+    """ Startup timing: records that the window is shown, then closes the application """
+    with open(ready_file, "w") as file:
+        file.write(f"{time.time()}\n")
+    root.destroy()
+
+
+## Background worker
+def run_jobs():
+    """ Worker thread: runs the submitted jobs one at a time, in order, until it gets None """
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        work, args, on_done, on_error = job
+        try:
+            result = work(*args)
+        except Exception as error:
+            traceback.print_exc()
+            ui_events.put((on_error, (error,)))
         else:
-            # Final completion - show option to open directory
-            open_dir_button = tk.Button(
-                success_win, 
-                text="보고서 폴더 열기", 
-                command=lambda: open_output_directory(output_folder), 
-                font=("Arial", 16, "bold"),
-                width=20,
-                height=2,
-                bg="#2196F3",
-                fg="white",
-                cursor="hand2"
-            )
-            open_dir_button.pack(pady=20)
+            if on_done is not None:
+                ui_events.put((on_done, (result,)))
+
+
+def submit_job(work, args=(), on_done=None, on_error=None):
+    """ Queues work(*args) for the worker thread; on_done(result) or on_error(error) then run on the Tk thread """
+    jobs.put((work, args, on_done, on_error or show_job_error))
+
+
+def show_job_error(error):
+    if isinstance(error, ReportError):
+        messagebox.showerror("Error", str(error))
+    else:
+        messagebox.showerror("Error", f"헌금보고서 처리 중 오류가 발생했습니다: {error}")
+    status_var.set("")
+
+
+def show_progress(text):
+    """ Shows text in the main window's status line (callable from the worker thread) """
+    ui_events.put((status_var.set, (text,)))
+
+
+def poll_ui_events():
+    """ Tk thread: runs the callbacks and progress updates posted by the worker """
+    while True:
+        try:
+            callback, args = ui_events.get_nowait()
+        except queue.Empty:
+            break
+        callback(*args)
+    root.after(UI_POLL_MS, poll_ui_events)
+
+
+def watch_for_new_pdf(date_str, on_new_pdf):
+    """
+    Records the PDFs already in the day's Data folder and calls on_new_pdf(path) once the counter has
+    completely written its next PDF. The folder is listed on every poll (see FolderWatcher). Returns the
+    watcher, whose handled names are the PDFs that do not belong to this count.
+    """
+    global pdf_watch_job
+    watcher = FolderWatcher(os.path.join(DATA_FOLDER, date_str), ".pdf")
+    watcher.snapshot()
+
+    def poll():
+        global pdf_watch_job
+        new_pdfs = watcher.poll()
+        if new_pdfs:
+            pdf_watch_job = None
+            on_new_pdf(new_pdfs[-1])
+        else:
+            pdf_watch_job = root.after(PDF_POLL_MS, poll)
+
+    pdf_watch_job = root.after(PDF_POLL_MS, poll)
+    return watcher
+
+
+def stop_pdf_watch():
+    """ Cancels the pending new-PDF poll, if any """
+    global pdf_watch_job
+    if pdf_watch_job is not None:
+        root.after_cancel(pdf_watch_job)
+        pdf_watch_job = None
 
 
 def confirm_completion(is_second_offering=False):
     """ Creates a pop-up window asking user to confirm cash counting completion """
     confirm_win = tk.Toplevel(root)
     confirm_win.title("Confirmation")
-    confirm_win.geometry("700x350")
+    confirm_win.geometry("700x400")
     
     offering_type = "2차" if is_second_offering else "1차"
     label_text = f"{offering_type} 헌금 현금 카운팅 완료 후,\n현금을 기계 하단부에서 빼시고,\n아래 '완료' 버튼을 클릭하십시오."
     label = tk.Label(confirm_win, text=label_text, font=("Arial", 18, "bold"), justify="center")
     label.pack(pady=40)
     
+    status_label = tk.Label(confirm_win, text="카운터의 새 PDF를 기다리는 중입니다. PDF가 생성되면 자동으로 보고서를 만듭니다.",
+                            font=("Arial", 12), wraplength=650)
+    status_label.pack()
+    
     def on_confirm():
+        # Only a PDF that was not in the folder when counting started belongs to this offering
+        pdf_file = find_latest_pdf(DATA_FOLDER, date_str, watcher.handled)
+        if pdf_file is None:
+            messagebox.showerror("Error", f"카운팅을 시작한 뒤 생성된 새 PDF가 없습니다.\n"
+                                          f"카운터가 {offering_type} 헌금 PDF를 저장했는지 확인하십시오.", parent=confirm_win)
+            return
+        stop_pdf_watch()
         confirm_win.destroy()
         process_message = f"{offering_type} 헌금 현금 보고서 생성을 시작합니다."
         messagebox.showinfo("Processing", process_message)
-        process_cash_count_data(is_second_offering)
+        process_cash_count_data(is_second_offering, pdf_file)
+    
+    def on_new_pdf(pdf_file):
+        # The counter has written this offering's PDF; no need to wait for the button
+        confirm_win.destroy()
+        process_cash_count_data(is_second_offering, pdf_file)
+    
+    def on_close():
+        stop_pdf_watch()
+        confirm_win.destroy()
+    
+    confirm_win.protocol("WM_DELETE_WINDOW", on_close)
     
     confirm_button = tk.Button(
         confirm_win, 
@@ -166,31 +305,47 @@ def confirm_completion(is_second_offering=False):
         cursor="hand2"
     )
     confirm_button.pack(pady=30)
+    
+    # Only a PDF written after this point belongs to this offering
+    stop_pdf_watch()
+    date_str = datetime.today().strftime("%Y%m%d")
+    watcher = watch_for_new_pdf(date_str, on_new_pdf)
+
+
+def start_counter_app(app_path):
+    """ Worker thread: launches the cash counting application and sets its parameters """
+    import pyautogui
+    
+    os.startfile(app_path)
+    time.sleep(0.5)
+
+    # Set the Port as "COM3"
+    pyautogui.click(x=803, y=226)
+    time.sleep(0.25)
+    pyautogui.click(x=803, y=241)
+
+    # Set the Baud Rate as 115200
+    pyautogui.click(x=943, y=222)
+    time.sleep(0.25)
+    pyautogui.click(x=934, y=244)
+
+    # Set the connection value to Open
+    time.sleep(0.25)
+    pyautogui.click(x=1020, y=224)
 
 
 def launch_app(app_path, is_second_offering=False):
-    """ Launch the cash counting application and set parameters """
-    try:
-        os.startfile(app_path)
-        time.sleep(0.5)
-
-        # Set the Port as "COM3"
-        pyautogui.click(x=803, y=226)
-        time.sleep(0.25)
-        pyautogui.click(x=803, y=241)
-
-        # Set the Baud Rate as 115200
-        pyautogui.click(x=943, y=222)
-        time.sleep(0.25)
-        pyautogui.click(x=934, y=244)
-
-        # Set the connection value to Open
-        time.sleep(0.25)
-        pyautogui.click(x=1020, y=224)
-        
+    """ Launch the cash counting application and set parameters (on the worker thread), then wait for the count """
+    def on_launched(_):
+        status_var.set("")
         confirm_completion(is_second_offering)
-    except Exception as e:
-        messagebox.showerror("Error", f"Failed to launch application: {e}")
+    
+    def on_launch_error(error):
+        status_var.set("")
+        messagebox.showerror("Error", f"Failed to launch application: {error}")
+    
+    status_var.set("카운터 프로그램 실행 중...")
+    submit_job(start_counter_app, (app_path,), on_launched, on_launch_error)
 
 
 def start_second_offering():
@@ -288,6 +443,35 @@ mass_time_var.set(None)
 has_second_offering_var = tk.BooleanVar()
 has_second_offering_var.set(False)
 
+# root.after id of the pending new-PDF poll (see watch_for_new_pdf)
+pdf_watch_job = None
+
+# Report workbook of the mass being counted, between its first and second offering
+report_session = None
+
+# Every processed count is also recorded in the offering ledger (see ledger.py); opened by the worker thread
+ledger = None
+
+# Jobs for the worker thread, and the callbacks it posts back to the Tk thread (see run_jobs)
+jobs = queue.Queue()
+ui_events = queue.Queue()
+UI_POLL_MS = 100
+worker = threading.Thread(target=run_jobs, name="cash-report-worker", daemon=True)
+worker.start()
+root.after(UI_POLL_MS, poll_ui_events)
+
+
+def on_app_close():
+    """ Lets the worker finish its jobs and save a first offering still waiting for its second offering, then exits """
+    stop_pdf_watch()
+    submit_job(save_pending_report)
+    jobs.put(None)
+    worker.join()
+    root.destroy()
+
+
+root.protocol("WM_DELETE_WINDOW", on_app_close)
+
 options = ["7시반", "9시", "11시", "17시"]
 for option in options:
     tk.Radiobutton(
@@ -313,5 +497,16 @@ start_button = tk.Button(
 )
 start_button.pack(pady=40)
 
+# Progress of the background work
+status_var = tk.StringVar()
+status_label = tk.Label(root, textvariable=status_var, font=("Arial", 12), wraplength=550)
+status_label.pack()
+
 # Run the main loop
+ready_file = os.environ.get(READY_FILE_ENV)
+if ready_file:
+    # Runs once the window has been drawn
+    root.after(0, lambda: root.after_idle(signal_ready, ready_file))
+else:
+    root.after(0, lambda: threading.Thread(target=preload_modules, name="preload", daemon=True).start())
 root.mainloop()
\ No newline at end of file
@@ -0,0 +1,51 @@
+## Offering report logic shared by the cash counting UI and the headless backfill (no Tk dependencies)
+import os
+from datetime import date
+from stage_trace import span
+from cash_tally import Tally, read_tally
+
+# Offering reports: one folder per date, filled in from the template
+REPORT_FOLDER = "E:\\헌금보고서"
+TEMPLATE_PATH = os.path.join(REPORT_FOLDER, "헌금보고서_양식.xlsx")
+
+
+def report_path(report_folder, mass_date, mass_time):
+    """ Path of a mass's offering report, e.g., <report_folder>\\01-05-2025\\헌금보고서_01-05-2025_9시미사.xlsx """
+    run_date = mass_date.strftime("%m-%d-%Y")
+    return os.path.join(report_folder, run_date, f'헌금보고서_{run_date}_{mass_time}미사.xlsx')
+
+
+def process_pdf(pdf_file, session, is_second_offering=False, mass_time=None, populate_header=False, mass_date=None,
+                ledger=None):
+    """
+    Processes the PDF and fills its data into the report workbook of the session (saved by session.save()),
+    and records the count in the ledger if one is given
+    """
+    fill_offering(read_tally(pdf_file), session, is_second_offering, mass_time, populate_header, mass_date, ledger,
+                  source=pdf_file)
+
+
+def process_counts(rows, total, session, is_second_offering=False, mass_time=None, populate_header=False,
+                   mass_date=None, ledger=None, source=None):
+    """ Same as process_pdf, for counts read without a PDF (e.g., from the counter's serial port, see bc40_serial.py) """
+    fill_offering(Tally(rows, total), session, is_second_offering, mass_time, populate_header, mass_date, ledger, source)
+
+
+def fill_offering(tally, session, is_second_offering, mass_time, populate_header, mass_date, ledger, source):
+    """ Fills an offering's Tally into the session's workbook and records it in the ledger """
+    # The mass date (datetime.date) defaults to today
+    mass_date = mass_date or date.today()
+    offering = 2 if is_second_offering else 1
+    if ledger is not None:
+        with span("ledger record"):
+            ledger.record_cash_count(mass_date, mass_time, offering, tally.rows, source)
+    
+    sheet = session.sheet
+    
+    # Populate date and time if this is the first time
+    if populate_header and mass_time:
+        sheet.cell(row=3, column=4, value=mass_date.strftime("%m/%d/%y"))
+        sheet.cell(row=3, column=6, value=mass_time)
+    
+    tally.write(sheet, offering)
+    session.unsaved = True
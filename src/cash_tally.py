@@ -0,0 +1,63 @@
+## Denomination tally of one offering, shared by cash_count.py and the report logic of the UI and backfill (no pandas)
+import os
+from stage_trace import span
+from bc40_report import DENOMINATIONS, read_bc40_report, validate_rows
+
+# Each denomination has a fixed report row, from row 7 ($1) to row 13 ($100) in DENOMINATIONS order (read back
+# by ledger.read_report_offerings); QTY/Amount go to columns C-D for the first offering and E-F for the second
+FIRST_ROW = 7
+OFFERING_COLUMNS = {1: 3, 2: 5}
+
+
+class Tally:
+    """
+    One offering's count: QTY and amount per denomination, in ascending denomination order.
+
+    The rows are checked when the tally is made (known denominations, QTY x DENO == AMT, and the
+    TOTAL row, when given, equal to the column sums); BC40LayoutError is raised otherwise.
+    """
+
+    __slots__ = ("denominations", "quantities", "amounts")
+
+    def __init__(self, rows, total=None):
+        rows = sorted((int(deno), int(qty), int(amt)) for deno, qty, amt in rows)
+        validate_rows(rows, self.column_sums(rows) if total is None else tuple(total))
+        self.denominations = tuple(deno for deno, _, _ in rows)
+        self.quantities = tuple(qty for _, qty, _ in rows)
+        self.amounts = tuple(amt for _, _, amt in rows)
+
+    @staticmethod
+    def column_sums(rows):
+        return sum(qty for _, qty, _ in rows), sum(amt for _, _, amt in rows)
+
+    @property
+    def rows(self):
+        """ (DENO, QTY, AMT) per denomination """
+        return list(zip(self.denominations, self.quantities, self.amounts))
+
+    @property
+    def total(self):
+        """ (QTY, AMT) of the whole offering """
+        return sum(self.quantities), sum(self.amounts)
+
+    def write(self, sheet, offering=1):
+        """
+        Writes QTY/Amount into each denomination's row of the offering's columns of a report sheet (openpyxl
+        worksheet), and clears the rows of the denominations the tally does not include
+        """
+        column = OFFERING_COLUMNS[offering]
+        counts = dict(zip(self.denominations, zip(self.quantities, self.amounts)))
+        for index, deno in enumerate(DENOMINATIONS):
+            qty, amt = counts.get(deno, (None, None))
+            sheet.cell(row=FIRST_ROW + index, column=column, value=qty)
+            sheet.cell(row=FIRST_ROW + index, column=column + 1, value=amt)
+
+    def __repr__(self):
+        return f"Tally({self.rows!r})"
+
+
+def read_tally(pdf_path):
+    """ Reads a BC-40 report PDF into a Tally """
+    with span("read_bc40_report", pdf=os.path.basename(pdf_path)):
+        rows, total = read_bc40_report(pdf_path)
+    return Tally(rows, total)
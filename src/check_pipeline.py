@@ -0,0 +1,157 @@
+## Staged check reading: decoder threads, one OCR stage and the result writer, connected by bounded queues
+import queue
+import threading
+import time
+
+# Marks the end of a stage's output
+DONE = object()
+
+# Seconds between checks for a failed stage while waiting on a queue
+WAIT_SLICE = 0.1
+
+
+class StageStats:
+    """ Busy time and items of one pipeline stage, summed over runs """
+
+    def __init__(self, name, threads=1):
+        self.name = name
+        self.threads = threads
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, seconds, items=1):
+        with self.lock:
+            self.busy_seconds += seconds
+            self.items += items
+
+    def utilization(self, wall_seconds):
+        """ Share of the stage's thread time spent working rather than waiting on its queues """
+        return self.busy_seconds / (wall_seconds * self.threads) if wall_seconds else 0.0
+
+
+class PipelineStats:
+    """ Per-stage statistics of the check pipeline over one or more runs (watch mode runs it per new batch) """
+
+    def __init__(self, reader_threads):
+        self.stages = [StageStats("decode", reader_threads), StageStats("ocr"), StageStats("write")]
+        self.wall_seconds = 0.0
+
+    def report(self):
+        """ Prints each stage's utilization; the busiest stage is the one limiting throughput """
+        if not self.wall_seconds:
+            return
+        print(f"Pipeline stages over {self.wall_seconds:.1f}s:")
+        for stage in self.stages:
+            print(f"  {stage.name:<7} {stage.threads} thread{'s' if stage.threads > 1 else ' '} "
+                  f"{stage.utilization(self.wall_seconds) * 100:5.1f}% busy, {stage.items} batches, "
+                  f"{stage.busy_seconds:.1f}s")
+        bottleneck = max(self.stages, key=lambda stage: stage.utilization(self.wall_seconds))
+        print(f"  Bottleneck: {bottleneck.name}")
+
+
+def run_pipeline(batches, decode, ocr, write, stats, queue_depth=2):
+    """
+    Runs batches through decode -> ocr -> write, overlapping the stages.
+
+    decode(batch) runs on stats' reader threads, ocr(batch, decoded) on one OCR thread (the models are
+    only ever used from one thread), and write(records) on the calling thread (which may own SQLite
+    connections, e.g., the ledger). At most queue_depth decoded batches and queue_depth OCR results
+    wait between the stages, which bounds the images held in memory. Batches reach write() in the order
+    they finish OCR. An exception in any stage stops the others and is raised here.
+
+    Inputs:
+    - batches (list): Work items, e.g., lists of (check number, file path).
+    - decode, ocr, write (callable): The stage functions.
+    - stats (PipelineStats): Receives the busy time of every stage and the wall time of the run.
+    - queue_depth (int): Capacity of each queue between two stages.
+    """
+    decode_stats, ocr_stats, write_stats = stats.stages
+    reader_threads = decode_stats.threads
+    pending = queue.Queue()
+    for batch in batches:
+        pending.put(batch)
+    decoded = queue.Queue(maxsize=queue_depth)
+    results = queue.Queue(maxsize=queue_depth)
+    failed = threading.Event()
+    errors = []
+
+    def put(target, item):
+        """ Waits for room in target; gives up (returns False) once a stage has failed """
+        while not failed.is_set():
+            try:
+                target.put(item, timeout=WAIT_SLICE)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def get(source):
+        """ Waits for the next item of source; DONE once a stage has failed """
+        while not failed.is_set():
+            try:
+                return source.get(timeout=WAIT_SLICE)
+            except queue.Empty:
+                pass
+        return DONE
+
+    def fail(error):
+        errors.append(error)
+        failed.set()
+
+    def read_stage():
+        try:
+            while not failed.is_set():
+                try:
+                    batch = pending.get_nowait()
+                except queue.Empty:
+                    break
+                start = time.perf_counter()
+                item = (batch, decode(batch))
+                decode_stats.add(time.perf_counter() - start)
+                if not put(decoded, item):
+                    return
+        except BaseException as error:
+            fail(error)
+        put(decoded, DONE)
+
+    def ocr_stage():
+        finished_readers = 0
+        try:
+            while finished_readers < reader_threads:
+                item = get(decoded)
+                if item is DONE:
+                    finished_readers += 1
+                    continue
+                start = time.perf_counter()
+                records = ocr(*item)
+                ocr_stats.add(time.perf_counter() - start)
+                if not put(results, records):
+                    return
+        except BaseException as error:
+            fail(error)
+        put(results, DONE)
+
+    run_start = time.perf_counter()
+    threads = [threading.Thread(target=read_stage, name=f"check-decode-{index}", daemon=True)
+               for index in range(reader_threads)]
+    threads.append(threading.Thread(target=ocr_stage, name="check-ocr", daemon=True))
+    for thread in threads:
+        thread.start()
+    try:
+        while True:
+            records = get(results)
+            if records is DONE:
+                break
+            start = time.perf_counter()
+            write(records)
+            write_stats.add(time.perf_counter() - start)
+    except BaseException as error:
+        # Includes Ctrl+C in watch mode: the other stages stop after their current batch
+        fail(error)
+    finally:
+        for thread in threads:
+            thread.join()
+        stats.wall_seconds += time.perf_counter() - run_start
+    if errors:
+        raise errors[0]
@@ -1,37 +1,145 @@
 ## Load dependencies 
 import re
 import os
-import pandas as pd
-import cv2
-import easyocr
-from tqdm import tqdm 
-from transformers import TrOCRProcessor, VisionEncoderDecoderModel
-from word2number import w2n
-from PIL import Image
-from openpyxl import load_workbook
+import sys
+import json
 import argparse
-import torch
+import time
+from datetime import date
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from trocr_backends import BACKENDS, backend_id, load_trocr
+from amount_decoding import generate_options
+from ocr_cache import DEFAULT_CACHE_FILE, DEFAULT_CACHE_MAX_MB, OcrCache, image_hash
+import stage_trace
+from stage_trace import span
+from folder_watch import FolderWatcher
+from check_pipeline import PipelineStats, run_pipeline
+from ledger import add_ledger_arguments, open_ledger
 
-def extract_amount(image_path, processor, model):
+# numpy, cv2, torch, easyocr, PIL, word2number, tqdm, openpyxl and giving_rollups (pandas) are imported in
+# the functions that use them, so the arguments are checked before any of them is loaded
+
+# In watch mode, creating a file with this name in the image directory ends the batch
+DONE_FILE = "DONE"
+
+# Courtesy-box fast path: characters EasyOCR may return there, and the confidence needed to skip TrOCR
+COURTESY_ALLOWLIST = "0123456789.,$"
+COURTESY_MIN_CONFIDENCE = 0.6
+
+EASYOCR_MODEL_DIR = "C:\\Users\\8940\\.EasyOCR\\model"
+
+# cv2.imread flag names per (decode scale, grayscale); the reduced flags shrink the image while decoding
+IMREAD_FLAGS = {
+    (1, False): "IMREAD_COLOR",
+    (2, False): "IMREAD_REDUCED_COLOR_2",
+    (4, False): "IMREAD_REDUCED_COLOR_4",
+    (8, False): "IMREAD_REDUCED_COLOR_8",
+    (1, True): "IMREAD_GRAYSCALE",
+    (2, True): "IMREAD_REDUCED_GRAYSCALE_2",
+    (4, True): "IMREAD_REDUCED_GRAYSCALE_4",
+    (8, True): "IMREAD_REDUCED_GRAYSCALE_8",
+}
+
+
+def load_check_image(image_path, decode_scale=1, grayscale=False):
     """
-    Extracts a numeric amount from a specified region in an image using OCR.
+    Decodes a check image once, optionally reduced and/or in grayscale.
+    The name and amount ROIs are then taken as views of the returned array, so the file is never decoded twice.
 
     Inputs:
-    - image_path (str): Path to the image file containing the text to extract.
-    - processor (object): Preprocessor for converting image data into model input format.
-    - model (object): Text recognition model for extracting text from images.
+    - image_path (str): Path to the check image.
+    - decode_scale (int): 1, 2, 4 or 8; the image is decoded at 1/decode_scale of the scanner resolution.
+    - grayscale (bool): Decode to a single channel instead of BGR.
 
     Outputs:
-    - Extracted amount (str): Numeric string of the recognized amount, e.g., "125".
-    - None: Returned if no valid amount is recognized.    
+    - image (numpy.ndarray): Decoded image (BGR, or single channel if grayscale).
     """
+    import cv2
 
-    # Load the image
-    image = cv2.imread(image_path)
+    image = cv2.imread(image_path, getattr(cv2, IMREAD_FLAGS[(decode_scale, grayscale)]))
     if image is None:
         raise ValueError(f"Image not found at {image_path}")
-        
-    (height, width, _) = image.shape
+    return image
+
+
+def peak_memory_mb():
+    """ Returns the peak resident memory of the current process in MB, or None if it is not available """
+    try:
+        import resource
+    except ImportError:
+        # Windows: PeakWorkingSetSize from GetProcessMemoryInfo
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return None
+        return counters.PeakWorkingSetSize / (1024 * 1024)
+
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def locate_amount_end(band, min_x_end, max_gap):
+    """
+    Finds where the handwriting on the legal-amount line ends, from column/row ink projections.
+
+    Inputs:
+    - band (numpy.ndarray): The legal-amount line region, from the left edge of the ROI to its widest x_end.
+    - min_x_end (int): Narrowest x_end (relative to the band) that may be returned.
+    - max_gap (int): Widest run of blank columns still treated as a space between written words.
+
+    Outputs:
+    - x_end (int or None): End column of the handwriting relative to the band, or None if the band holds no ink.
+    """
+    import cv2
+    import numpy as np
+
+    gray = band if band.ndim == 2 else cv2.cvtColor(band, cv2.COLOR_BGR2GRAY)
+
+    # Ink pixels are 1, paper is 0
+    _, ink = cv2.threshold(gray, 0, 1, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+
+    # Rows inked across most of the band are the printed rule, not handwriting
+    ink[ink.mean(axis=1) > 0.5] = 0
+
+    # Columns holding more than a speck of ink
+    inked_columns = np.flatnonzero(ink.sum(axis=0) > max(1, int(ink.shape[0] * 0.02)))
+    if inked_columns.size == 0 or inked_columns.size > ink.shape[1] * 0.9:
+        # Blank band, or a threshold that found no contrast
+        return None
+
+    # The amount is written from the left; it ends at the first gap wider than a space between words
+    gaps = np.flatnonzero(np.diff(inked_columns) > max_gap)
+    x_end = inked_columns[gaps[0]] if gaps.size else inked_columns[-1]
+
+    # Keep a word gap of margin after the last stroke
+    return min(max(int(x_end) + max_gap, min_x_end), band.shape[1])
+
+
+def amount_roi_candidates(image, roi_mode="ink"):
+    """
+    Builds the candidate regions for the handwritten legal-amount line, in the order they should be read.
+
+    Inputs:
+    - image (numpy.ndarray): Decoded check image.
+    - roi_mode (str): "ink" puts the ROI found by locate_amount_end first and keeps the width sweep as the
+      fallback; "sweep" only uses the width sweep (widest first).
+
+    Outputs:
+    - rois (list of numpy.ndarray): Views into the image, one per candidate ROI.
+    """
+    (height, width) = image.shape[:2]
 
     # Define ROI parameters
     y_start = int(height * 0.45)
@@ -41,35 +149,231 @@ def extract_amount(image_path, processor, model):
     final_x_end = int(width * 0.14)
     step = int(width * 0.025)
 
-    # Iterate over decreasing ROI widths
-    for x_end in range(initial_x_end, final_x_end - 1, -step):
-        # Extract the ROI
-        roi = image[y_start:y_end, x_start:x_end]
+    # Decreasing ROI widths
+    rois = [image[y_start:y_end, x_start:x_end] for x_end in range(initial_x_end, final_x_end - 1, -step)]
 
-        # Convert the ROI to RGB
-        roi_rgb = cv2.cvtColor(roi, cv2.COLOR_BGR2RGB)
+    if roi_mode == "ink":
+        band = image[y_start:y_end, x_start:initial_x_end]
+        located_end = locate_amount_end(band, final_x_end - x_start, int(width * 0.03))
+        if located_end is not None:
+            rois.insert(0, band[:, :located_end])
 
-        # Convert to PIL Image
-        roi_image = Image.fromarray(roi_rgb)
+    return rois
 
-        # Preprocess the image
-        pixel_values = processor(images=roi_image, return_tensors="pt").pixel_values
 
-        # Generate text
-        generated_ids = model.generate(pixel_values, max_new_tokens=20)
-        recognized_text = processor.batch_decode(generated_ids, skip_special_tokens=True)[0]
+def parse_amount(recognized_text):
+    """
+    Converts the recognized legal-amount text into a numeric string, e.g., "one hundred twenty five" -> "125",
+    "Twenty-Five Dollars and 50/100" -> "25.50", "ten dollars and five cents" -> "10.05",
+    "One Hundred Dollars and no cents" -> "100" (cents words that are not a number count as no cents).
+    Returns None if the text cannot be converted.
+    """
+    from word2number import w2n
+
+    text = recognized_text.lower()
 
-        # Attempt to convert recognized text to a number
+    # Cents written as a fraction ("50/100", "xx/100") or in words before "cents"
+    cents = 0
+    fraction = re.search(r"(\d{1,2}|xx|no)\s*/\s*100", text)
+    if fraction:
+        cents = int(fraction.group(1)) if fraction.group(1).isdigit() else 0
+        text = text[:fraction.start()]
+    elif "cents" in text.split():
+        dollars_text, _, cents_text = text.rpartition("dollars")
         try:
-            amount_value = w2n.word_to_num(recognized_text)
-            return str(amount_value)
+            cents = w2n.word_to_num(cents_text.replace("cents", ""))
         except ValueError:
-            # If conversion fails, continue to the next ROI width
-            continue
+            cents = None
+        if cents is None or (cents >= 100 and not dollars_text):
+            # "no cents", "zero cents" or OCR noise (or no "dollars" before them): the words are the dollars
+            cents = 0
+        else:
+            text = dollars_text
+    text = text.replace("dollars", " ")
+
+    try:
+        dollars = w2n.word_to_num(text)
+    except ValueError:
+        if not cents:
+            return None
+        dollars = 0
+    if cents >= 100:
+        return None
+    return str(dollars) if not cents else f"{dollars}.{cents:02d}"
+
+
+def courtesy_roi(image):
+    """ Returns the region of the numeric courtesy-amount box (right side, above the legal line) as a view of the check image """
+    (height, width) = image.shape[:2]
+    return image[int(height * 0.3):int(height * 0.46), int(width * 0.72):int(width * 0.98)]
+
+
+def parse_courtesy_amount(recognized_text):
+    """
+    Converts the text read from the courtesy box into a numeric string, e.g., "$1,250.00" -> "1250", "25.50" -> "25.50".
+    Cents set apart from the dollars (written as a superscript, or read as a separate box) count as cents:
+    "125 00" -> "125", "125 50" -> "125.50". Returns None unless the text is a plausible amount.
+    """
+    text = re.sub(r"\s*([.,])\s*", r"\1", " ".join(recognized_text.split())).lstrip("$ ")
+    match = re.fullmatch(r"(\d{1,3}(?:,\d{3})+|\d+)(?:[., ](\d{2}))?", text)
+    if not match:
+        return None
+    dollars = int(match.group(1).replace(",", ""))
+    cents = match.group(2) or "00"
+    if dollars == 0 and cents == "00":
+        return None
+    return str(dollars) if cents == "00" else f"{dollars}.{cents}"
+
+
+def same_amount(first, second):
+    """ Whether two numeric amount strings (e.g., "25" and "25.00") are the same amount """
+    try:
+        return first is not None and second is not None and round(float(first), 2) == round(float(second), 2)
+    except ValueError:
+        return False
+
+
+def extract_courtesy_amount(image, reader, min_confidence=COURTESY_MIN_CONFIDENCE):
+    """
+    Reads the numeric courtesy amount with EasyOCR restricted to digits, the fast path before TrOCR.
+
+    Inputs:
+    - image (numpy.ndarray): Decoded check image.
+    - reader (easyocr.Reader): Initialized EasyOCR reader.
+    - min_confidence (float): Lowest EasyOCR confidence (of any text piece in the box) that is trusted.
+
+    Outputs:
+    - amount_text (str or None): Numeric string of the donation amount, or None if the box could not be read
+      confidently (the legal line has to be read then).
+    """
+    with span("easyocr courtesy"):
+        results = reader.readtext(courtesy_roi(image), allowlist=COURTESY_ALLOWLIST)
+    if not results:
+        return None
+    # Join the pieces left to right, apart, so a separately read cents group stays recognizable;
+    # the box is as confident as its least confident piece
+    results.sort(key=lambda result: min(point[0] for point in result[0]))
+    if min(result[2] for result in results) < min_confidence:
+        return None
+    return parse_courtesy_amount(" ".join(result[1] for result in results))
+
+
+def recognize_texts(rois, processor, model, batch_size=1, generate_kwargs=None):
+    """
+    Runs TrOCR on a list of ROI crops, batch_size crops per generate call.
+
+    Inputs:
+    - rois (list of numpy.ndarray): BGR image crops.
+    - processor (object): Preprocessor for converting image data into model input format.
+    - model (object): Text recognition model for extracting text from images.
+    - batch_size (int): Number of crops stacked into one tensor batch.
+    - generate_kwargs (dict or None): Extra model.generate options, e.g., amount_decoding.generate_options.
+
+    Outputs:
+    - texts (list of str): Recognized text, in the same order as rois.
+    """
+    import cv2
+    from PIL import Image
+
+    texts = []
+    for start in range(0, len(rois), batch_size):
+        # Convert the ROIs to RGB PIL images; the processor resizes every crop to the
+        # same input size, so each batch is a fixed-size tensor
+        roi_images = [Image.fromarray(cv2.cvtColor(roi, cv2.COLOR_GRAY2RGB if roi.ndim == 2 else cv2.COLOR_BGR2RGB))
+                      for roi in rois[start:start + batch_size]]
+        pixel_values = processor(images=roi_images, return_tensors="pt").pixel_values
+
+        # Generate text
+        with span("trocr generate", crops=len(roi_images)):
+            generated_ids = model.generate(pixel_values, max_new_tokens=20, **(generate_kwargs or {}))
+        texts.extend(processor.batch_decode(generated_ids, skip_special_tokens=True))
+    return texts
+
+
+def extract_amount(image, processor, model, roi_mode="ink", decode="open"):
+    """
+    Extracts a numeric amount from a specified region in an image using OCR.
+
+    Inputs:
+    - image (numpy.ndarray or str): Decoded check image, or the path to the image file containing the text to extract.
+    - processor (object): Preprocessor for converting image data into model input format.
+    - model (object): Text recognition model for extracting text from images.
+    - roi_mode (str): "ink" to try the ink-profile ROI before the width sweep, "sweep" for the width sweep only.
+    - decode (str): "open" decodes with TrOCR's full vocabulary, "numeric" only allows amount words
+      (see amount_decoding).
+
+    Outputs:
+    - Extracted amount (str): Numeric string of the recognized amount, e.g., "125".
+    - None: Returned if no valid amount is recognized.    
+    """
+
+    # Load the image unless the caller has already decoded it
+    if isinstance(image, str):
+        image = load_check_image(image)
+
+    generate_kwargs = generate_options(processor, decode)
 
-    # If all attempts fail, raise an error
+    # Iterate over the located ROI and then decreasing ROI widths
+    for roi in amount_roi_candidates(image, roi_mode):
+        recognized_text = recognize_texts([roi], processor, model, generate_kwargs=generate_kwargs)[0]
+
+        # Attempt to convert recognized text to a number; if conversion fails, continue to the next ROI width
+        amount_value = parse_amount(recognized_text)
+        if amount_value is not None:
+            return amount_value
+
+    # If all attempts fail, return None
     return None
 
+
+def extract_amounts_batched(images, processor, model, batch_size=16, widths_per_round=1, roi_mode="ink", decode="open"):
+    """
+    Extracts the donation amounts of many checks at once, batching TrOCR generate calls across checks.
+
+    Every round queues the next widths_per_round candidate ROIs of each check that is still
+    unresolved, runs them through TrOCR in batches of batch_size crops, and keeps the first
+    candidate (in the order of amount_roi_candidates) whose text converts to a number.
+
+    Inputs:
+    - images (list of numpy.ndarray): Decoded check images.
+    - processor (object): Preprocessor for converting image data into model input format.
+    - model (object): Text recognition model for extracting text from images.
+    - batch_size (int): Number of ROI crops per generate call.
+    - widths_per_round (int): Number of candidate ROIs queued per check per round.
+    - roi_mode (str): "ink" or "sweep", see amount_roi_candidates.
+    - decode (str): "open" or "numeric", see extract_amount.
+
+    Outputs:
+    - amounts (list of str or None): Numeric amount string per image, None if no width could be read.
+    - generate_calls (list of int): Number of ROI crops run through TrOCR per image.
+    """
+    candidates = [amount_roi_candidates(image, roi_mode) for image in images]
+    generate_kwargs = generate_options(processor, decode)
+    amounts = [None] * len(images)
+    next_candidate = [0] * len(images)
+    pending = list(range(len(images)))
+
+    while pending:
+        # Collect the next candidate widths of every unresolved check
+        rois = []
+        owners = []
+        for idx in pending:
+            start = next_candidate[idx]
+            for roi in candidates[idx][start:start + widths_per_round]:
+                rois.append(roi)
+                owners.append(idx)
+            next_candidate[idx] = start + widths_per_round
+
+        # Map the decoded strings back to their checks; crops are queued widest first
+        for idx, recognized_text in zip(owners, recognize_texts(rois, processor, model, batch_size, generate_kwargs)):
+            if amounts[idx] is None:
+                amounts[idx] = parse_amount(recognized_text)
+
+        pending = [idx for idx in pending if amounts[idx] is None and next_candidate[idx] < len(candidates[idx])]
+
+    generate_calls = [min(count, len(rois)) for count, rois in zip(next_candidate, candidates)]
+    return amounts, generate_calls
+
 def extract_address_and_names(name_text):
     """
     Separates names and addresses from a given text, treating text starting with numbers as the address.
@@ -113,7 +417,132 @@ def extract_address_and_names(name_text):
     return names_text, address_text
 
 
-def extract_check_info(image_path, reader, processor, model):
+def name_roi(image):
+    """ Returns the region of interest (ROI) for names (top-left corner) as a view of the check image """
+    (height, width) = image.shape[:2]
+    return image[0:int(height * 0.3), 0:int(width * 0.5)]
+
+
+def extract_names(image, reader, name_mode="full"):
+    """
+    Reads the issuer names from the top-left corner of a decoded check image.
+
+    Inputs:
+    - image (numpy.ndarray): Decoded check image.
+    - reader (object): OCR reader for extracting text from specific regions in the image.
+    - name_mode (str): "full" runs EasyOCR's whole readtext pipeline on the region; "fast" uses extract_names_fast.
+
+    Outputs:
+    - names_text (str or None): Concatenated names as a single string, or None if no names are found.
+    """
+    if name_mode == "fast":
+        return extract_names_fast([image], reader)[0]
+
+    # Use selected OCR model to read text from the names ROI
+    with span("easyocr readtext"):
+        name_results = reader.readtext(name_roi(image))
+    name_text = ", ".join([res[1] for res in name_results])  # Combine all detected texts
+    names_text, _ = extract_address_and_names(name_text)
+    return names_text
+
+
+def detect_name_lines(roi, reader, detect_scale=0.5, max_lines=3):
+    """
+    Detects the text boxes of the top lines of a name region on a downscaled copy.
+
+    Inputs:
+    - roi (numpy.ndarray): Name region of a check image.
+    - reader (easyocr.Reader): Initialized EasyOCR reader (only its detector is used).
+    - detect_scale (float): Scale the region is shrunk to for detection.
+    - max_lines (int): Number of text lines kept from the top; the names come before the address.
+
+    Outputs:
+    - lines (list of list of [x_min, x_max, y_min, y_max]): Boxes in region coordinates, per line, top to bottom.
+    """
+    import cv2
+
+    small = cv2.resize(roi, None, fx=detect_scale, fy=detect_scale, interpolation=cv2.INTER_AREA)
+    with span("easyocr detect"):
+        horizontal_list, _ = reader.detect(small)
+
+    # Boxes back in full region coordinates, top to bottom
+    boxes = sorted(([int(x_min / detect_scale), int(x_max / detect_scale), int(y_min / detect_scale), int(y_max / detect_scale)]
+                    for x_min, x_max, y_min, y_max in horizontal_list[0]), key=lambda box: box[2])
+
+    # A box whose vertical center is above the bottom of the current line belongs to that line
+    lines = []
+    for box in boxes:
+        if lines and (box[2] + box[3]) / 2 < max(line_box[3] for line_box in lines[-1]):
+            lines[-1].append(box)
+        else:
+            if len(lines) == max_lines:
+                break
+            lines.append([box])
+    return [sorted(line) for line in lines]
+
+
+def extract_names_fast(images, reader, detect_scale=0.5, max_lines=3, pad=8):
+    """
+    Reads the issuer names of many checks with one EasyOCR recognition call.
+
+    Text is detected on a downscaled copy of each name region and only the top max_lines lines are kept.
+    Their crops (full resolution, grayscale) are stacked on one canvas and recognized in a single batch.
+    The recognized lines then go through extract_address_and_names as in the full path.
+
+    Inputs:
+    - images (list of numpy.ndarray): Decoded check images.
+    - reader (easyocr.Reader): Initialized EasyOCR reader for text recognition.
+    - detect_scale (float): Scale the name regions are shrunk to for detection.
+    - max_lines (int): Number of text lines recognized per check.
+    - pad (int): Blank pixels between the stacked crops.
+
+    Outputs:
+    - names (list of str or None): Concatenated names per image, None if no names are found.
+    """
+    import cv2
+    import numpy as np
+
+    crops = []
+    owners = []
+    for idx, image in enumerate(images):
+        roi = name_roi(image)
+        gray = roi if roi.ndim == 2 else cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+        for line in detect_name_lines(roi, reader, detect_scale, max_lines):
+            for x_min, x_max, y_min, y_max in line:
+                crop = gray[max(0, y_min):y_max, max(0, x_min):x_max]
+                if crop.size:
+                    crops.append(crop)
+                    owners.append(idx)
+
+    texts = [[] for _ in images]
+    if crops:
+        # Stack the crops on one white canvas; each crop is found again by its y offset
+        canvas = np.full((sum(crop.shape[0] + pad for crop in crops) + pad, max(crop.shape[1] for crop in crops) + 2 * pad),
+                         255, dtype=np.uint8)
+        canvas_boxes = []
+        crop_at = {}
+        y = pad
+        for crop_idx, crop in enumerate(crops):
+            canvas[y:y + crop.shape[0], pad:pad + crop.shape[1]] = crop
+            canvas_boxes.append([pad, pad + crop.shape[1], y, y + crop.shape[0]])
+            crop_at[y] = crop_idx
+            y += crop.shape[0] + pad
+
+        with span("easyocr recognize", crops=len(crops)):
+            results = reader.recognize(canvas, horizontal_list=canvas_boxes, free_list=[], batch_size=len(crops))
+        recognized = [None] * len(crops)
+        for box, text, _ in results:
+            recognized[crop_at[int(box[0][1])]] = text
+
+        # Crops were queued per check in reading order
+        for idx, text in zip(owners, recognized):
+            if text:
+                texts[idx].append(text)
+
+    return [extract_address_and_names(", ".join(check_texts))[0] for check_texts in texts]
+
+
+def extract_check_info(image_path, reader, processor, model, amount_mode="auto"):
     """
     Extracts names, address, and check donation amount information from a given image.
 
@@ -122,91 +551,595 @@ def extract_check_info(image_path, reader, processor, model):
     - reader (object): OCR reader for extracting text from specific regions in the image.
     - processor (object): Preprocessor for converting image data into model input format (for amount extraction).
     - model (object): Text recognition model for extracting the donation amount.
+    - amount_mode (str): "auto" reads the numeric courtesy box first and only runs TrOCR on the legal line
+      when that read is missing or low-confidence; "legal" always reads the legal line with TrOCR;
+      "verify" reads both and uses the legal line when they disagree.
 
     Outputs:
     - names_text (str or None): Concatenated names as a single string, or None if no names are found.
     - amount_text (str or None): Numeric string of the donation amount, e.g., "125", or None if no amount is recognized.
     """
     
-    # Load the image using OpenCV
-    image = cv2.imread(image_path)
-    
-    # Get the height and width of the grayscale image
-    (height, width, _) = image.shape
+    # Load the image once; both ROIs below are views of it
+    image = load_check_image(image_path)
     
     ## Name and Address
-    # Define the region of interest (ROI) for names (top-left corner)
-    roi_name = image[0:int(height * 0.3), 0:int(width * 0.5)]
-    
-    # Use selected OCR model to read text from the names ROI
-    name_results = reader.readtext(roi_name)
-    name_text = ", ".join([res[1] for res in name_results])  # Combine all detected texts
-    names_text, _ = extract_address_and_names(name_text)
+    names_text = extract_names(image, reader)
     
     ## Check Donation Amount
-    amount_text = extract_amount(image_path, processor, model)
+    amount_text = extract_courtesy_amount(image, reader) if amount_mode in ("auto", "verify") else None
+    if amount_text is None or amount_mode == "verify":
+        legal_text = extract_amount(image, processor, model)
+        if not same_amount(amount_text, legal_text):
+            amount_text = legal_text
     
     # Return the extracted text for names and donation amount
     return names_text, amount_text
 
 
-def process_checks(check_directory, reader, processor, model, output_filename):
+def list_check_files(check_directory):
     """
-    Process all scanned check images in a directory to extract Name, Address, and Donation Amount.
-    
+    Lists the scanned check fronts in a directory, ordered by check number.
+
     Inputs:
     - check_directory (str): Path to the directory containing scanned check images (.tif files).
+
+    Outputs:
+    - check_files (list of (str, str)): (check number, file path) pairs, e.g., ("102", ".../Check_102.Front.tif").
+    """
+    check_files = [check_file_entry(os.path.join(check_directory, file))
+                   for file in os.listdir(check_directory) if file.endswith("Front.tif")]
+    return sorted(check_files, key=lambda item: int(item[0]))
+
+
+def check_file_entry(file_path):
+    """ Returns the (check number, file path) pair of a check image, e.g., ".../Check_102.Front.tif" -> "102" """
+    # Extract check number from filename
+    check_number = os.path.basename(file_path).split('_')[1].split('.')[0]
+    return check_number, file_path
+
+
+def read_check_batch(check_files, reader, processor, model, batch_size=1, decode_scale=1, grayscale=False, roi_mode="ink",
+                     name_mode="full", amount_mode="auto", decode="open"):
+    """
+    Extracts names and donation amounts for a group of checks, batching the TrOCR amount reads.
+
+    Inputs:
+    - check_files (list of (str, str)): (check number, file path) pairs from list_check_files.
     - reader (easyocr.Reader): Initialized EasyOCR reader for text recognition.
     - processor (object): Preprocessor for converting image data into model input format (for amount extraction).
     - model (object): Text recognition model for extracting the donation amount.
-    - output_directory (str): Output directory where the xlsx file will be saved. 
+    - batch_size (int): Number of ROI crops per TrOCR generate call.
+    - decode_scale (int): Decode the images at 1/decode_scale resolution (1, 2, 4 or 8).
+    - grayscale (bool): Decode the images to a single channel.
+    - roi_mode (str): "ink" or "sweep", see amount_roi_candidates.
+    - name_mode (str): "full" (readtext per check) or "fast" (extract_names_fast, one recognition call per batch).
+    - amount_mode (str): "auto" (courtesy box first, TrOCR only for the checks it could not read), "legal"
+      (TrOCR on the legal line for every check) or "verify" (both, the legal line wins), see extract_check_info.
+    - decode (str): TrOCR decoding mode for the legal line, "open" or "numeric" (see extract_amount).
+
+    Outputs:
+    - data (list of dict): One {"Names", "Check Number", "DonationAmount"} record per check, plus the
+      decode time ("DecodeMs"), decoded image size ("ImageMB"), name reading time ("NameMs", the batch
+      time divided by its checks in fast mode), process peak memory ("PeakMB"), where the amount was
+      read ("AmountPath": "courtesy", "legal", or in verify mode "verified" when both reads agree and
+      "mismatch" when they do not) and the number of TrOCR generate calls needed for it
+      ("GenerateCalls", 0 for the courtesy box).
     """
-    # List to store extracted data for each check
-    data = []
-    tif_files = [file for file in os.listdir(check_directory) if file.endswith("Front.tif")]
+    decoded = decode_check_batch(check_files, decode_scale, grayscale)
+    return ocr_check_batch(check_files, decoded, reader, processor, model, batch_size, roi_mode, name_mode, amount_mode,
+                           decode)
 
-    # Iterate through all files in the directory
-    for file in tqdm(tif_files, desc="Processing Checks", unit="file"):
-        file_path = os.path.join(check_directory, file)
 
-        # Extract check number from filename
-        check_number = file.split('_')[1].split('.')[0]
-        
-        # Extract information from the check 
-        cleaned_names, cleaned_amount = extract_check_info(file_path, reader, processor, model)
-
-        # Append the extracted information to the data list
-        data.append({
-                "Names": cleaned_names,
-                "Check Number": check_number,
-                "DonationAmount": cleaned_amount
-        })
-
-    # Convert the collected data into a Pandas DataFrame and export as the xlsx file.
-    df = pd.DataFrame(data)
-    df.rename(columns = {
-    'Names': '발행자', 
-    'Check Number': 'CHECK #',
-    'DonationAmount': 'AMOUNT'
-        }, inplace=True)
-    
-    df['CHECK #'] = df['CHECK #'].astype(int)
-    df['AMOUNT'] = df['AMOUNT'].astype(float)
-    df.loc[:, '금액'] = df['AMOUNT']
+def decode_check_batch(check_files, decode_scale=1, grayscale=False):
+    """ First half of read_check_batch: decodes the check images; returns (images, decode ms per check) """
+    images = []
+    decode_ms = []
+    for check_number, file_path in check_files:
+        decode_start = time.perf_counter()
+        with span("imread", check=check_number):
+            images.append(load_check_image(file_path, decode_scale, grayscale))
+        decode_ms.append((time.perf_counter() - decode_start) * 1000)
+    return images, decode_ms
+
+
+def ocr_check_batch(check_files, decoded, reader, processor, model, batch_size=1, roi_mode="ink", name_mode="full",
+                    amount_mode="auto", decode="open"):
+    """ Second half of read_check_batch: reads names and amounts from the decode_check_batch output; same records """
+    images, decode_ms = decoded
+    if name_mode == "fast":
+        name_start = time.perf_counter()
+        names = extract_names_fast(images, reader)
+        name_ms = [(time.perf_counter() - name_start) * 1000 / len(images)] * len(images)
+    else:
+        names = []
+        name_ms = []
+        for (check_number, _), image in zip(check_files, images):
+            name_start = time.perf_counter()
+            with span("names", check=check_number):
+                names.append(extract_names(image, reader))
+            name_ms.append((time.perf_counter() - name_start) * 1000)
+
+    amounts = [None] * len(images)
+    if amount_mode in ("auto", "verify"):
+        for index, ((check_number, _), image) in enumerate(zip(check_files, images)):
+            with span("courtesy amount", check=check_number):
+                amounts[index] = extract_courtesy_amount(image, reader)
+    amount_paths = ["courtesy" if amount is not None else "legal" for amount in amounts]
+    generate_calls = [0] * len(images)
+
+    # Only the checks whose courtesy box could not be read go through TrOCR, unless every read is verified
+    legal = [index for index, amount in enumerate(amounts) if amount is None or amount_mode == "verify"]
+    if legal:
+        with span("amounts", checks=[check_files[index][0] for index in legal]):
+            legal_amounts, legal_calls = extract_amounts_batched([images[index] for index in legal], processor, model,
+                                                                 batch_size=batch_size, roi_mode=roi_mode, decode=decode)
+        for index, amount, calls in zip(legal, legal_amounts, legal_calls):
+            if amounts[index] is not None:
+                # Verify mode: the legal line decides when the two reads disagree
+                amount_paths[index] = "verified" if same_amount(amounts[index], amount) else "mismatch"
+            amounts[index] = amount
+            generate_calls[index] = calls
+    peak_mb = peak_memory_mb()
+
+    return [{
+            "Names": cleaned_names,
+            "Check Number": check_number,
+            "DonationAmount": cleaned_amount,
+            "DecodeMs": check_decode_ms,
+            "ImageMB": image.nbytes / (1024 * 1024),
+            "NameMs": check_name_ms,
+            "PeakMB": peak_mb,
+            "AmountPath": amount_path,
+            "GenerateCalls": check_generate_calls
+    } for (check_number, _), cleaned_names, cleaned_amount, check_decode_ms, image, check_name_ms, amount_path, check_generate_calls
+        in zip(check_files, names, amounts, decode_ms, images, name_ms, amount_paths, generate_calls)]
+
+
+def write_check_report(data, output_filename):
+    """
+    Writes the extracted check records into the formatted report workbook.
+
+    Inputs:
+    - data (iterable of dict): Records from read_check_batch (or a journal), in report order.
+    - output_filename (str): Report xlsx file (the formatter) to fill in and save.
+
+    Outputs:
+    - rows (list of tuple): The (CHECK #, names, amount) rows written, in report order.
+    """
+    from openpyxl import load_workbook
 
-    column_order = ['CHECK #', '발행자', '금액']
-    df = df[column_order]
     # workbook = load_workbook("C:\\Users\\hkmcc\\Documents\\Check Scanner execution\\Check_Table_Formatter.xlsx") # load the formatter 
-    workbook = load_workbook(output_filename) # load the formatter 
+    with span("load_workbook"):
+        workbook = load_workbook(output_filename) # load the formatter 
     sheet = workbook.active    
     count = 1
-    for row_idx, row in enumerate(df.itertuples(index=False), start=2):
+    rows = []
+    for row_idx, record in enumerate(data, start=2):
+        # Columns: CHECK #, 발행자, 금액
+        amount = record["DonationAmount"]
+        row = (int(record["Check Number"]), record["Names"], float(amount) if amount is not None else None)
+        rows.append(row)
         sheet.cell(row=row_idx+2, column=9, value=count) 
         count = count + 1
         for col_idx, value in enumerate(row, start=1): 
             sheet.cell(row=row_idx+2, column=col_idx+9, value=value)
 
-    workbook.save(output_filename)
+    with span("workbook save"):
+        workbook.save(output_filename)
+    return rows
+
+
+def append_journal(journal_file, records):
+    """ Appends check records to a JSON-lines journal and forces them to disk """
+    with open(journal_file, "a", encoding="utf-8") as journal:
+        for record in records:
+            journal.write(json.dumps(record, ensure_ascii=False) + "\n")
+        journal.flush()
+        os.fsync(journal.fileno())
+
+
+def recover_journal(journal_file):
+    """
+    Prepares the journal of an interrupted run for appending and returns the check numbers it already holds.
+    A last line cut off by a crash is not a finished check and is truncated away.
+    """
+    if not os.path.exists(journal_file):
+        return set()
+    check_numbers = set()
+    complete_bytes = 0
+    with open(journal_file, "rb") as journal:
+        for line in journal:
+            if not line.endswith(b"\n"):
+                break
+            check_numbers.add(json.loads(line)["Check Number"])
+            complete_bytes += len(line)
+    with open(journal_file, "r+b") as journal:
+        journal.truncate(complete_bytes)
+    return check_numbers
+
+
+def read_journal_sorted(journal_file):
+    """
+    Yields the records of a journal in check-number order, one at a time.
+    Only a (check number -> file offset) index is held in memory; a check recorded twice keeps its last record.
+    """
+    offsets = {}
+    with open(journal_file, "rb") as journal:
+        offset = 0
+        for line in journal:
+            offsets[int(json.loads(line)["Check Number"])] = offset
+            offset += len(line)
+
+        for check_number in sorted(offsets):
+            journal.seek(offsets[check_number])
+            yield json.loads(journal.readline())
+
+
+class ReadStats:
+    """ Running totals of the per-check OCR statistics of a run, printed by report() """
+
+    def __init__(self):
+        self.checks = 0
+        self.decode_ms_total = 0.0
+        self.decode_ms_max = 0.0
+        self.image_mb_total = 0.0
+        self.name_ms_total = 0.0
+        self.peak_mb = None
+        self.generate_calls = 0
+        # Checks whose amount came from the courtesy box / from TrOCR on the legal line
+        self.courtesy_checks = 0
+        self.legal_checks = 0
+        # Verify mode: checks whose two reads agreed, and the check numbers of those that did not
+        self.verified_checks = 0
+        self.mismatch_checks = []
+        # (check number, generate calls) of the checks that needed the width sweep fallback
+        self.fallback_checks = []
+
+    def add(self, records):
+        for record in records:
+            self.checks += 1
+            self.decode_ms_total += record["DecodeMs"]
+            self.decode_ms_max = max(self.decode_ms_max, record["DecodeMs"])
+            self.image_mb_total += record["ImageMB"]
+            self.name_ms_total += record["NameMs"]
+            if record["PeakMB"] is not None:
+                self.peak_mb = max(self.peak_mb or 0, record["PeakMB"])
+            self.generate_calls += record["GenerateCalls"]
+            if record["AmountPath"] == "courtesy":
+                self.courtesy_checks += 1
+            else:
+                self.legal_checks += 1
+            if record["AmountPath"] == "verified":
+                self.verified_checks += 1
+            elif record["AmountPath"] == "mismatch":
+                self.mismatch_checks.append(record["Check Number"])
+            if record["GenerateCalls"] > 1:
+                self.fallback_checks.append((record["Check Number"], record["GenerateCalls"]))
+
+    def report(self):
+        """ Prints the decode time, decoded image size, name reading time, peak memory, amount paths and TrOCR generate calls per check """
+        print(f"Decode: {self.decode_ms_total / self.checks:.1f} ms/check on average (max {self.decode_ms_max:.1f} ms), "
+              f"{self.image_mb_total / self.checks:.1f} MB decoded per check")
+        print(f"Names: {self.name_ms_total / self.checks:.1f} ms/check on average")
+        if self.peak_mb is not None:
+            # With several workers this is the largest peak of any one worker process
+            print(f"Peak memory: {self.peak_mb:.0f} MB")
+        print(f"Amounts: {self.courtesy_checks} from the courtesy box, {self.legal_checks} from the legal line (TrOCR)")
+        if self.verified_checks or self.mismatch_checks:
+            print(f"Courtesy box and legal line agreed on {self.verified_checks} checks; legal line used for "
+                  f"{len(self.mismatch_checks)}: {sorted(self.mismatch_checks, key=int)}")
+        print(f"TrOCR generate calls: {self.generate_calls} for {self.checks} checks "
+              f"({self.generate_calls / self.checks:.2f} per check)")
+        for check_number, generate_calls in sorted(self.fallback_checks, key=lambda item: int(item[0])):
+            print(f"  Check {check_number}: {generate_calls} generate calls")
+
+
+def load_models(backend='torch', model_dir=None, num_threads=None, easyocr_dir=EASYOCR_MODEL_DIR, download_enabled=True):
+    """
+    Loads the EasyOCR reader (names) and the TrOCR processor and model (amounts).
+
+    Inputs:
+    - backend (str): TrOCR recognition backend, one of trocr_backends.BACKENDS ("torch", "int8", "onnx").
+    - model_dir (str or None): Local TrOCR model directory; None uses the Hugging Face model name.
+    - num_threads (int or None): CPU threads for the onnx backend.
+    - easyocr_dir (str): EasyOCR model storage directory.
+    - download_enabled (bool): Let EasyOCR download missing models; False fails instead (offline runs).
+
+    Outputs:
+    - reader (easyocr.Reader): Initialized EasyOCR reader for text recognition.
+    - processor (TrOCRProcessor): Preprocessor for the TrOCR model.
+    - model (object): Handwritten text recognition model of the chosen backend.
+    """
+    import easyocr
+    import torch
+
+    with span("model load: easyocr"):
+        reader = easyocr.Reader(['en'], gpu = torch.cuda.is_available(), model_storage_directory=easyocr_dir,
+                                download_enabled=download_enabled)#, user_network_directory='C:/Users/8940/.EasyOCR/user_network')
+    with span("model load: trocr", backend=backend):
+        processor, model = load_trocr(backend, model_dir, num_threads)
+    return reader, processor, model
+
+
+# Models of a worker process, loaded once by init_worker
+worker_models = None
+
+
+def init_worker(torch_threads, model_options):
+    """ Process pool initializer: caps the thread pools and loads the models once per worker """
+    global worker_models
+    import cv2
+    import torch
+
+    torch.set_num_threads(torch_threads)
+    cv2.setNumThreads(1)
+    worker_models = load_models(num_threads=torch_threads, **model_options)
+
+
+def read_check_batch_in_worker(check_files, batch_size, read_options):
+    """
+    Runs read_check_batch in a worker process with the models loaded by init_worker.
+    Returns the records and the trace events recorded for them in this worker.
+    """
+    reader, processor, model = worker_models
+    records = read_check_batch(check_files, reader, processor, model, batch_size=batch_size, **read_options)
+    return records, stage_trace.drain()
+
+
+def cache_namespace(model_options=None, read_options=None):
+    """ Names the models and read settings behind a set of OCR results, for the OCR result cache """
+    model_options = model_options or {}
+    settings = sorted((read_options or {}).items())
+    return "|".join([backend_id(model_options.get('backend', 'torch'), model_options.get('model_dir')),
+                     "easyocr:en"] + [f"{key}={value}" for key, value in settings])
+
+
+def process_checks(check_directory, reader, processor, model, output_filename, batch_size=1, workers=1, model_options=None,
+                   cache=None, journal_file=None, resume=False, watch=False, poll_interval=1.0, idle_timeout=None,
+                   ledger=None, reader_threads=2, queue_depth=2, **read_options):
+    """
+    Process all scanned check images in a directory to extract Name, Address, and Donation Amount.
+    
+    Inputs:
+    - check_directory (str): Path to the directory containing scanned check images (.tif files).
+    - reader (easyocr.Reader): Initialized EasyOCR reader for text recognition.
+    - processor (object): Preprocessor for converting image data into model input format (for amount extraction).
+    - model (object): Text recognition model for extracting the donation amount.
+    - output_directory (str): Output directory where the xlsx file will be saved. 
+    - batch_size (int): Number of checks read together, and of ROI crops per TrOCR generate call.
+      1 reproduces the one-image-at-a-time behaviour.
+    - workers (int): Number of worker processes. With more than one worker, each worker loads its
+      own models (reader, processor and model may then be None) and the batches are shared out
+      between the workers.
+    - model_options (dict or None): Keyword options for load_models in the worker processes (backend, model_dir).
+    - cache (ocr_cache.OcrCache or None): OCR result cache; images it already holds are not read again.
+    - journal_file (str or None): Streaming mode. Every finished check is appended to this JSON-lines
+      journal as it is produced (instead of being kept in memory), and the report is written from it.
+    - resume (bool): Keep the checks already in journal_file and only read the remaining ones;
+      otherwise an existing journal is started over.
+    - watch (bool): Watch-folder mode (single process only). Instead of listing the directory once, keep
+      polling it and read each new check image as soon as the scanner has finished writing it, until a
+      file named DONE_FILE appears in the directory, idle_timeout passes without a new image, or Ctrl+C.
+    - poll_interval (float): Seconds between directory polls in watch mode.
+    - idle_timeout (float or None): Seconds without a new image after which watch mode finishes.
+    - ledger (ledger.Ledger or None): Offering ledger; the report rows are recorded in it under today's date
+      and the giving rollups are updated.
+    - reader_threads (int): Single-process mode: threads decoding the next batches while the current one is
+      in OCR (see check_pipeline.run_pipeline); 0 decodes and reads each batch in turn.
+    - queue_depth (int): Decoded batches (and OCR results) that may wait between the pipeline stages.
+    - read_options: Further keyword options for read_check_batch (decode_scale, grayscale, roi_mode, name_mode).
+
+    Outputs:
+    - stats (dict): "checks" in the report, "read" (checks sent to OCR this run), "elapsed" and
+      "first_result" (seconds from the start of the run until the first check was done).
+    """
+    from tqdm import tqdm
+
+    if watch and workers > 1:
+        raise ValueError("Watch mode reads checks in this process; use workers=1")
+
+    run_start = time.perf_counter()
+    first_result = []
+
+    # List to store extracted data for each check (unless they are streamed to the journal)
+    data = []
+    read_stats = ReadStats()
+    cached_data = []
+    image_hashes = {}
+
+    # Checks already in the journal of an interrupted run are not read again
+    journaled = set()
+    if journal_file is not None:
+        if resume:
+            journaled = recover_journal(journal_file)
+            print(f"Resuming from {journal_file}: {len(journaled)} checks already done")
+        else:
+            open(journal_file, "w").close()
+
+    def lookup_cache(check_files):
+        """
+        Splits off the checks whose image content was already read with the same models and settings;
+        returns (uncached files, cached records). Runs on the pipeline's reader threads too.
+        """
+        uncached_files = []
+        cached_now = []
+        for check_number, file_path in check_files:
+            with span("cache lookup", check=check_number):
+                image_hashes[check_number] = image_hash(file_path)
+                cached = cache.get(image_hashes[check_number])
+            if cached is None:
+                uncached_files.append((check_number, file_path))
+            else:
+                cached_now.append({"Names": cached[0], "Check Number": check_number, "DonationAmount": cached[1]})
+        return uncached_files, cached_now
+
+    # Single-process reading overlaps image decoding with OCR in a staged pipeline
+    pipeline_stats = PipelineStats(reader_threads) if workers == 1 and reader_threads > 0 else None
+    decode_options = {key: value for key, value in read_options.items() if key in ("decode_scale", "grayscale")}
+    recognize_options = {key: value for key, value in read_options.items() if key not in decode_options}
+
+    read_seconds = 0.0
+    read_checks = 0
+    with tqdm(total=None if watch else len(list_check_files(check_directory)), desc="Processing Checks", unit="file") as progress:
+
+        def collect(records):
+            if not first_result:
+                first_result.append(time.perf_counter() - run_start)
+            if journal_file is not None:
+                append_journal(journal_file, records)
+            else:
+                data.extend(records)
+            read_stats.add(records)
+            if cache is not None:
+                cache.put_many([(image_hashes[record["Check Number"]], record["Names"], record["DonationAmount"])
+                                for record in records])
+            progress.update(len(records))
+
+        def collect_cached(cached_now):
+            cached_data.extend(cached_now)
+            if journal_file is not None:
+                append_journal(journal_file, cached_now)
+            progress.update(len(cached_now))
+
+        def decode_batch(batch):
+            """ Pipeline reader stage: hashes and looks up the batch in the cache, then decodes the rest """
+            cached_now = []
+            if cache is not None:
+                batch, cached_now = lookup_cache(batch)
+            return cached_now, batch, decode_check_batch(batch, **decode_options) if batch else None
+
+        def ocr_batch(_, decoded):
+            cached_now, batch, images = decoded
+            records = ocr_check_batch(batch, images, reader, processor, model, batch_size=batch_size,
+                                      **recognize_options) if batch else []
+            return cached_now, records
+
+        def write_batch(results):
+            cached_now, records = results
+            collect_cached(cached_now)
+            if records:
+                collect(records)
+
+        def read_files(check_files):
+            """ Reads a list of check files (skipping journaled and cached ones); returns the number sent to OCR """
+            read_before = read_stats.checks
+            check_files = [(check_number, file_path) for check_number, file_path in check_files
+                           if check_number not in journaled]
+            if cache is not None and pipeline_stats is None:
+                check_files, cached_now = lookup_cache(check_files)
+                collect_cached(cached_now)
+            batches = [check_files[start:start + batch_size] for start in range(0, len(check_files), batch_size)]
+
+            if workers > 1:
+                # Split the cores between the workers so torch does not oversubscribe the CPU
+                torch_threads = max(1, (os.cpu_count() or 1) // workers)
+                with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                         initargs=(torch_threads, model_options or {})) as executor:
+                    futures = [executor.submit(read_check_batch_in_worker, batch, batch_size, read_options) for batch in batches]
+                    for future in as_completed(futures):
+                        records, worker_events = future.result()
+                        stage_trace.extend(worker_events)
+                        collect(records)
+            elif pipeline_stats is not None:
+                # The reader threads also hash the images and look them up in the cache
+                run_pipeline(batches, decode_batch, ocr_batch, write_batch, pipeline_stats, queue_depth)
+            else:
+                # Iterate through the files in groups of batch_size checks
+                for batch in batches:
+                    collect(read_check_batch(batch, reader, processor, model, batch_size=batch_size, **read_options))
+            return read_stats.checks - read_before
+
+        if watch:
+            # Start from the images already in the folder, then pick up each new one once it is fully written
+            watcher = FolderWatcher(check_directory, "Front.tif")
+            print(f"Watching {check_directory} for new checks "
+                  f"(create a file named {DONE_FILE} there or press Ctrl+C when the batch is done)...")
+            last_new_file = time.perf_counter()
+            try:
+                while True:
+                    new_files = sorted((check_file_entry(file_path) for file_path in watcher.poll()),
+                                       key=lambda item: int(item[0]))
+                    if new_files:
+                        last_new_file = time.perf_counter()
+                        read_start = time.perf_counter()
+                        read_checks += read_files(new_files)
+                        read_seconds += time.perf_counter() - read_start
+                        continue
+                    if os.path.exists(os.path.join(check_directory, DONE_FILE)) and not watcher.pending:
+                        break
+                    if idle_timeout is not None and time.perf_counter() - last_new_file > idle_timeout:
+                        break
+                    time.sleep(poll_interval)
+            except KeyboardInterrupt:
+                print("Watch stopped; writing the report for the checks read so far.")
+        else:
+            read_start = time.perf_counter()
+            read_checks = read_files(list_check_files(check_directory))
+            read_seconds = time.perf_counter() - read_start
+
+    if read_checks:
+        print(f"Read {read_checks} checks in {read_seconds:.1f}s "
+              f"({read_checks / read_seconds:.2f} checks/sec, batch size {batch_size}, workers {workers})")
+        read_stats.report()
+        if pipeline_stats is not None:
+            pipeline_stats.report()
+    if cache is not None:
+        print(f"OCR cache: {cache.hits} hits, {cache.misses} misses")
+
+    # Batches finish out of order across workers; the report lists checks by check number
+    if journal_file is not None:
+        report_rows = write_check_report(read_journal_sorted(journal_file), output_filename)
+    else:
+        data.extend(cached_data)
+        data.sort(key=lambda record: int(record["Check Number"]))
+        report_rows = write_check_report(data, output_filename)
+    if ledger is not None:
+        from giving_rollups import update_rollups
+
+        with span("ledger record"):
+            ledger.record_checks(date.today(), report_rows, output_filename)
+        with span("rollups update"):
+            update_rollups(ledger)
+
+    return {
+        "checks": len(journaled) + len(cached_data) + read_stats.checks,
+        "read": read_checks,
+        "elapsed": time.perf_counter() - run_start,
+        "first_result": first_result[0] if first_result else (time.perf_counter() - run_start if cached_data else None),
+    }
+
+
+def add_ocr_arguments(parser):
+    """ Adds the model, read and cache options shared by check_scan.py and the check scan service """
+    parser.add_argument('--batch_size', type=int, default=1, help='checks per batch and ROI crops per TrOCR generate call')
+    parser.add_argument('--decode_scale', type=int, default=1, choices=[1, 2, 4, 8], help='decode check images at 1/N resolution')
+    parser.add_argument('--grayscale', action='store_true', help='decode check images in grayscale')
+    parser.add_argument('--backend', default='torch', choices=BACKENDS, help='TrOCR recognition backend for the amount line')
+    parser.add_argument('--model_dir', metavar='path', default=None, help='local TrOCR model directory (no network access)')
+    parser.add_argument('--roi_mode', default='ink', choices=['ink', 'sweep'], help='locate the amount line from ink profiles, or only sweep ROI widths')
+    parser.add_argument('--name_mode', default='full', choices=['full', 'fast'], help='full EasyOCR readtext on the name region, or detect on a downscaled region and batch-recognize the top lines')
+    parser.add_argument('--amount_mode', default='auto', choices=['auto', 'legal', 'verify'], help='read the numeric courtesy box first and use TrOCR only as the fallback, always read the legal line with TrOCR, or read both and report disagreements')
+    parser.add_argument('--decode', default='open', choices=['open', 'numeric'], help='decode the legal line with the full TrOCR vocabulary, or only allow amount words')
+    parser.add_argument('--cache_file', metavar='file', default=DEFAULT_CACHE_FILE, help='OCR result cache file')
+    parser.add_argument('--cache_max_mb', type=float, default=DEFAULT_CACHE_MAX_MB, help='size limit of the OCR result cache')
+    parser.add_argument('--no_cache', action='store_true', help='read every check image again, ignoring the OCR result cache')
+
+
+def ocr_options(args):
+    """ Splits parsed add_ocr_arguments options into (model_options, read_options) """
+    model_options = {'backend': args.backend, 'model_dir': args.model_dir}
+    read_options = {'decode_scale': args.decode_scale, 'grayscale': args.grayscale, 'roi_mode': args.roi_mode,
+                    'name_mode': args.name_mode, 'amount_mode': args.amount_mode,
+                    'decode': args.decode}
+    return model_options, read_options
+
+
+def open_cache(args, model_options, read_options):
+    """ Opens the OCR result cache selected by the parsed options, or returns None with --no_cache """
+    if args.no_cache:
+        return None
+    return OcrCache(args.cache_file, cache_namespace(model_options, read_options), args.cache_max_mb)
 
 
 ## Execution
@@ -214,7 +1147,26 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('--img_dir', metavar='path', required=True, help='image file directory')
     parser.add_argument('--report_file', metavar='file', required=True, help='report file name')
+    parser.add_argument('--workers', type=int, default=1, help='number of worker processes, each loading its own models')
+    parser.add_argument('--journal', metavar='file', default=None, help='append each check to this journal as it is read, and write the report from it')
+    parser.add_argument('--resume', action='store_true', help='continue an interrupted run from its --journal')
+    parser.add_argument('--watch', action='store_true', help='keep watching --img_dir and read each check as soon as it is scanned')
+    parser.add_argument('--poll_interval', type=float, default=1.0, help='seconds between folder polls in --watch mode')
+    parser.add_argument('--idle_timeout', type=float, default=None, help='finish --watch mode after this many seconds without a new check')
+    parser.add_argument('--trace', metavar='file', default=None, help='record per-stage timings to this Chrome trace JSON file (or set OFFERING_TRACE)')
+    parser.add_argument('--reader_threads', type=int, default=2, help='threads decoding the next check images during OCR (0: no overlap)')
+    parser.add_argument('--queue_depth', type=int, default=2, help='decoded batches that may wait for OCR')
+    add_ocr_arguments(parser)
+    add_ledger_arguments(parser)
     args = parser.parse_args()
+    if args.resume and not args.journal:
+        parser.error("--resume needs the --journal of the interrupted run")
+    if args.watch and args.workers > 1:
+        parser.error("--watch reads checks in one process; drop --workers")
+    if args.trace:
+        stage_trace.enable(args.trace)
+
+    import torch
 
     # Set main models 
     print("Loading main models...")
@@ -222,22 +1174,49 @@ if __name__ == "__main__":
         print("Using GPU")
     else :
         print("GPU is not available")
-    reader = easyocr.Reader(['en'], gpu = torch.cuda.is_available(), model_storage_directory="C:\\Users\\8940\\.EasyOCR\\model")#, user_network_directory='C:/Users/8940/.EasyOCR/user_network')
-    trocr_processor = TrOCRProcessor.from_pretrained('microsoft/trocr-base-handwritten', use_fast=True)
-    trocr_model = VisionEncoderDecoderModel.from_pretrained('microsoft/trocr-base-handwritten')
-    print("Model loading complete.")
+    model_options, read_options = ocr_options(args)
+    if args.workers > 1:
+        # Each worker process loads its own copy of the models
+        print(f"Models will be loaded in {args.workers} worker processes.")
+        reader, trocr_processor, trocr_model = None, None, None
+    else:
+        load_start = time.perf_counter()
+        reader, trocr_processor, trocr_model = load_models(**model_options)
+        print(f"Model loading complete ({args.backend} backend, {time.perf_counter() - load_start:.1f}s, "
+              f"peak memory {peak_memory_mb() or 0:.0f} MB).")
 
     check_image_dir = args.img_dir
     report_filename = args.report_file
     print("Image file directory: " + check_image_dir)
     print("Report file name: " + report_filename)
 
+    cache = open_cache(args, model_options, read_options)
+    ledger = open_ledger(args)
+
     # Process scanned images and save the csv file 
     print("Processing scanned check images...")
     process_checks(check_directory=check_image_dir, 
                     reader=reader, 
                     processor=trocr_processor, 
                     model=trocr_model,
-                    output_filename=report_filename)
+                    output_filename=report_filename,
+                    batch_size=args.batch_size,
+                    workers=args.workers,
+                    model_options=model_options,
+                    cache=cache,
+                    journal_file=args.journal,
+                    resume=args.resume,
+                    watch=args.watch,
+                    poll_interval=args.poll_interval,
+                    idle_timeout=args.idle_timeout,
+                    ledger=ledger,
+                    reader_threads=args.reader_threads,
+                    queue_depth=args.queue_depth,
+                    **read_options)
+    if cache is not None:
+        cache.close()
+    if ledger is not None:
+        ledger.close()
+    stage_trace.finish()
         
-    print("Processing and file export complete.")
\ No newline at end of file
+    print("Processing and file export complete.")
@@ -0,0 +1,121 @@
+## Load dependencies
+import argparse
+import json
+import os
+import secrets
+import socket
+import sys
+import time
+
+# Address of the check scan service (check_scan_service.py); it only listens on this machine
+SERVICE_HOST = 'localhost'
+DEFAULT_SERVICE_PORT = 50517
+
+# Random key the service creates on its first run, readable only by the user; a request without it is refused
+SERVICE_KEY_FILE = os.path.join(os.path.expanduser("~"), ".check_scan", "service.key")
+
+# Messages are single lines of JSON (never pickled), at most this long
+MAX_MESSAGE_BYTES = 1024 * 1024
+
+
+def load_service_key(create=False):
+    """ Reads the service key; with create, first writes a new random key if there is none """
+    if create and not os.path.exists(SERVICE_KEY_FILE):
+        os.makedirs(os.path.dirname(SERVICE_KEY_FILE), mode=0o700, exist_ok=True)
+        # Created with owner-only permissions (on Windows, the user profile folder's access rules apply)
+        fd = os.open(SERVICE_KEY_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as key_file:
+            key_file.write(secrets.token_hex(32))
+    with open(SERVICE_KEY_FILE) as key_file:
+        return key_file.read().strip()
+
+
+def send_message(stream, message):
+    """ Writes a dict as one JSON line to a socket file """
+    stream.write(json.dumps(message).encode("utf-8") + b"\n")
+    stream.flush()
+
+
+def recv_message(stream):
+    """ Reads one JSON line from a socket file; ValueError if it is missing, too long or not a JSON object """
+    line = stream.readline(MAX_MESSAGE_BYTES + 1)
+    if not line.endswith(b"\n"):
+        raise ValueError("Incomplete or oversized message")
+    message = json.loads(line)
+    if not isinstance(message, dict):
+        raise ValueError("Message is not a JSON object")
+    return message
+
+
+def request(message, port=DEFAULT_SERVICE_PORT):
+    """ Sends a request (with the service key) to the service and returns its reply """
+    with socket.create_connection((SERVICE_HOST, port)) as connection, connection.makefile("rwb") as stream:
+        send_message(stream, dict(message, key=load_service_key()))
+        return recv_message(stream)
+
+
+def submit_job(img_dir, report_file, port=DEFAULT_SERVICE_PORT):
+    """
+    Sends a "process this directory into this report" job to the running check scan service.
+
+    Inputs:
+    - img_dir (str): Directory containing the scanned check images.
+    - report_file (str): Report xlsx file to fill in.
+    - port (int): Port the service listens on.
+
+    Outputs:
+    - reply (dict): {"status": "ok", "stats": {...}} from process_checks, or {"status": "error", "error": "..."}.
+    """
+    # The service resolves paths in its own working directory
+    return request({'command': 'process',
+                    'img_dir': os.path.abspath(img_dir),
+                    'report_file': os.path.abspath(report_file)}, port)
+
+
+def shutdown_service(port=DEFAULT_SERVICE_PORT):
+    """ Asks the running check scan service to exit """
+    return request({'command': 'shutdown'}, port)
+
+
+## Execution
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Submit a check scan job to the running check scan service")
+    parser.add_argument('--img_dir', metavar='path', help='image file directory')
+    parser.add_argument('--report_file', metavar='file', help='report file name')
+    parser.add_argument('--port', type=int, default=DEFAULT_SERVICE_PORT, help='service port')
+    parser.add_argument('--shutdown', action='store_true', help='stop the service')
+    args = parser.parse_args()
+
+    try:
+        if args.shutdown:
+            reply = shutdown_service(args.port)
+            if reply['status'] != 'ok':
+                print("Shutdown refused: " + reply['error'])
+                sys.exit(1)
+            print("Check scan service stopped.")
+            sys.exit(0)
+
+        if not args.img_dir or not args.report_file:
+            parser.error("--img_dir and --report_file are required")
+
+        print("Image file directory: " + args.img_dir)
+        print("Report file name: " + args.report_file)
+        submit_start = time.perf_counter()
+        reply = submit_job(args.img_dir, args.report_file, args.port)
+    except ConnectionRefusedError:
+        print(f"The check scan service is not running on port {args.port}. Start it with: python src/check_scan_service.py")
+        sys.exit(1)
+
+    except FileNotFoundError:
+        print(f"No service key in {SERVICE_KEY_FILE}; start the service once with: python src/check_scan_service.py")
+        sys.exit(1)
+
+    if reply['status'] != 'ok':
+        print("Processing failed: " + reply['error'])
+        sys.exit(1)
+
+    stats = reply['stats']
+    first_result = f"{stats['first_result']:.2f}s" if stats['first_result'] is not None else "n/a"
+    print(f"Processed {stats['checks']} checks ({stats['read']} read, the rest from the cache) "
+          f"in {time.perf_counter() - submit_start:.1f}s; time to first result {first_result}.")
+    print("Processing and file export complete.")
@@ -0,0 +1,111 @@
+## Load dependencies
+import argparse
+import hmac
+import socket
+import time
+import traceback
+import stage_trace
+from check_scan import add_ocr_arguments, load_models, ocr_options, open_cache, peak_memory_mb, process_checks
+from check_scan_client import (DEFAULT_SERVICE_PORT, SERVICE_HOST, SERVICE_KEY_FILE, load_service_key, recv_message,
+                               send_message)
+from ledger import add_ledger_arguments, open_ledger
+
+# Seconds a connected client has to send its request
+REQUEST_TIMEOUT = 10
+
+
+def serve(port, batch_size, model_options, read_options, cache, ledger=None):
+    """
+    Loads the OCR models once and processes check scan jobs from check_scan_client.py until told to shut down.
+    Jobs run one at a time in this process, so every job after the first starts with warm models.
+
+    Inputs:
+    - port (int): Port to listen on (localhost only).
+    - batch_size (int): Checks per batch and ROI crops per TrOCR generate call.
+    - model_options (dict): Keyword options for load_models (backend, model_dir).
+    - read_options (dict): Keyword options for read_check_batch (decode_scale, grayscale, roi_mode).
+    - cache (ocr_cache.OcrCache or None): OCR result cache shared by all jobs.
+    - ledger (ledger.Ledger or None): Offering ledger every job's checks are recorded in.
+    """
+    print("Loading main models...")
+    load_start = time.perf_counter()
+    reader, processor, model = load_models(**model_options)
+    print(f"Model loading complete ({model_options['backend']} backend, {time.perf_counter() - load_start:.1f}s, "
+          f"peak memory {peak_memory_mb() or 0:.0f} MB).")
+
+    # Requests are JSON lines carrying the key from SERVICE_KEY_FILE, so only this user's processes are served
+    service_key = load_service_key(create=True)
+    with socket.create_server((SERVICE_HOST, port)) as listener:
+        print(f"Check scan service listening on {SERVICE_HOST}:{port} (key in {SERVICE_KEY_FILE})")
+        while True:
+            connection, _ = listener.accept()
+            # A client that connects but never sends its request does not hold up the service
+            connection.settimeout(REQUEST_TIMEOUT)
+            with connection, connection.makefile("rwb") as stream:
+                try:
+                    job = recv_message(stream)
+                except (ValueError, OSError) as e:
+                    print(f"Ignored a malformed request: {e}")
+                    continue
+                if not hmac.compare_digest(str(job.get('key', '')), service_key):
+                    send_message(stream, {'status': 'error', 'error': "Wrong service key"})
+                    continue
+                if job.get('command') == 'shutdown':
+                    send_message(stream, {'status': 'ok'})
+                    break
+                if job.get('command') != 'process':
+                    send_message(stream, {'status': 'error', 'error': f"Unknown command {job.get('command')!r}"})
+                    continue
+                missing = [field for field in ('img_dir', 'report_file')
+                           if not isinstance(job.get(field), str) or not job[field]]
+                if missing:
+                    send_message(stream, {'status': 'error', 'error': f"Missing {', '.join(missing)}"})
+                    continue
+
+                print("Image file directory: " + job['img_dir'])
+                print("Report file name: " + job['report_file'])
+                try:
+                    stats = process_checks(check_directory=job['img_dir'],
+                                           reader=reader,
+                                           processor=processor,
+                                           model=model,
+                                           output_filename=job['report_file'],
+                                           batch_size=batch_size,
+                                           cache=cache,
+                                           ledger=ledger,
+                                           **read_options)
+                    if cache is not None:
+                        cache.flush()
+                    if stats['first_result'] is not None:
+                        print(f"Time to first result: {stats['first_result']:.2f}s")
+                    stage_trace.finish()
+                    send_message(stream, {'status': 'ok', 'stats': stats})
+                except Exception as e:
+                    # Keep the service (and its warm models) alive; the client reports the failure
+                    traceback.print_exc()
+                    send_message(stream, {'status': 'error', 'error': f"{type(e).__name__}: {e}"})
+                finally:
+                    # Each job's trace only holds that job's events
+                    stage_trace.reset()
+
+    print("Check scan service stopped.")
+
+
+## Execution
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keep the check OCR models loaded and process jobs from check_scan_client.py")
+    parser.add_argument('--port', type=int, default=DEFAULT_SERVICE_PORT, help='port to listen on (localhost only)')
+    add_ocr_arguments(parser)
+    add_ledger_arguments(parser)
+    args = parser.parse_args()
+
+    model_options, read_options = ocr_options(args)
+    cache = open_cache(args, model_options, read_options)
+    ledger = open_ledger(args)
+    try:
+        serve(args.port, args.batch_size, model_options, read_options, cache, ledger)
+    finally:
+        if cache is not None:
+            cache.close()
+        if ledger is not None:
+            ledger.close()
@@ -0,0 +1,116 @@
+## Load dependencies
+import os
+import time
+
+# Seconds a complete-looking file may stay locked for writing before it is reported anyway
+# (e.g., a viewer or antivirus scanner holding it without write sharing)
+LOCK_TIMEOUT = 30
+# Seconds a new file may stay empty before it is dropped (e.g., a scan that failed after creating its file)
+EMPTY_TIMEOUT = 30
+
+
+def is_write_locked(path):
+    """
+    Returns True while another program still holds the file open for writing.
+    On Windows the scanner/counter software opens its output without write sharing, so opening it for
+    writing fails until it is closed; elsewhere this always returns False and only the settle check applies.
+    A read-only file cannot be opened for writing either, so it never counts as locked.
+    """
+    if not os.access(path, os.W_OK):
+        return False
+    try:
+        fd = os.open(path, os.O_RDWR)
+    except PermissionError:
+        return True
+    except FileNotFoundError:
+        return False
+    os.close(fd)
+    return False
+
+
+class FolderWatcher:
+    """
+    Reports each new file with the given suffix in a folder once it is completely written, i.e. its
+    size and modification time have stayed the same for settle_polls polls and nobody holds it open
+    for writing (for at most lock_timeout seconds). Every file is reported only once. A file that is
+    still empty after empty_timeout seconds is dropped with a message instead, so it does not stay
+    pending forever.
+
+    The folder is listed on every poll: FAT/exFAT drives and network shares do not reliably update a
+    folder's modification time, and listing a few hundred entries is cheap.
+    """
+
+    def __init__(self, directory, suffix, known=(), settle_polls=2, lock_timeout=LOCK_TIMEOUT, empty_timeout=EMPTY_TIMEOUT):
+        self.directory = directory
+        self.suffix = suffix.lower()
+        self.settle_polls = settle_polls
+        self.lock_timeout = lock_timeout
+        self.empty_timeout = empty_timeout
+        # File names already reported, or present before watching started
+        self.handled = set(known)
+        # File name -> (size, mtime_ns, unchanged polls) of new files that are still being written
+        self.pending = {}
+        # File name -> time.monotonic() when a settled file was first found locked for writing
+        self.locked_since = {}
+        # File name -> time.monotonic() when a pending file was first found empty
+        self.empty_since = {}
+
+    def snapshot(self):
+        """ Marks every matching file currently in the folder as handled, so only later files are reported """
+        self.handled.update(name for name in self.list_names())
+        self.pending.clear()
+        self.locked_since.clear()
+        self.empty_since.clear()
+
+    def list_names(self):
+        if not os.path.isdir(self.directory):
+            return []
+        with os.scandir(self.directory) as entries:
+            return [entry.name for entry in entries if entry.name.lower().endswith(self.suffix) and entry.is_file()]
+
+    def poll(self):
+        """ Returns the paths of the files that became complete since the last poll, oldest name first """
+        for name in self.list_names():
+            if name not in self.handled and name not in self.pending:
+                self.pending[name] = (None, None, 0)
+
+        ready = []
+        for name, (size, mtime_ns, unchanged) in list(self.pending.items()):
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                # Renamed or deleted before it was finished
+                del self.pending[name]
+                self.locked_since.pop(name, None)
+                self.empty_since.pop(name, None)
+                continue
+            if stat.st_size == 0:
+                empty_since = self.empty_since.setdefault(name, time.monotonic())
+                if time.monotonic() - empty_since >= self.empty_timeout:
+                    print(f"{name} is still empty after {self.empty_timeout}s; skipping it")
+                    del self.pending[name]
+                    self.empty_since.pop(name)
+                    self.handled.add(name)
+                    continue
+            else:
+                self.empty_since.pop(name, None)
+            if (stat.st_size, stat.st_mtime_ns) == (size, mtime_ns) and stat.st_size > 0:
+                unchanged += 1
+            else:
+                unchanged = 0
+            self.pending[name] = (stat.st_size, stat.st_mtime_ns, unchanged)
+
+            if unchanged < self.settle_polls:
+                self.locked_since.pop(name, None)
+                continue
+            if is_write_locked(path):
+                locked_since = self.locked_since.setdefault(name, time.monotonic())
+                if time.monotonic() - locked_since < self.lock_timeout:
+                    continue
+                print(f"{name} is still locked for writing after {self.lock_timeout}s; reading it anyway")
+            del self.pending[name]
+            self.locked_since.pop(name, None)
+            self.handled.add(name)
+            ready.append(path)
+        return sorted(ready)
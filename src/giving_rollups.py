@@ -0,0 +1,233 @@
+## Incremental weekly/monthly/annual giving rollups on top of the offering ledger (see ledger.py)
+import argparse
+import os
+from datetime import date
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.styles import Alignment, Border, Font, Side
+from openpyxl.utils import get_column_letter
+from ledger import DEFAULT_LEDGER_FILE, LEDGER_ENV, Ledger
+
+PERIODS = ("week", "month", "year")
+
+# pandas period frequency per rollup period; weeks run Monday to Sunday
+PERIOD_FREQ = {"week": "W-SUN", "month": "M", "year": "Y"}
+
+# Cash print look (Cash_Table_Formatter): Aptos Narrow 12, thin cell borders, dollar formats
+FONT_NAME = "Aptos Narrow"
+AMOUNT_FORMAT = '_("$"* #,##0.00_);_("$"* \\(#,##0.00\\);_("$"* "-"??_);_(@_)'
+DENO_FORMAT = '"$"#,##0_);[Red]\\("$"#,##0\\)'
+THIN = Side(style="thin")
+CELL_BORDER = Border(left=THIN, right=THIN, top=THIN, bottom=THIN)
+
+
+def create_rollup_tables(connection):
+    connection.executescript(
+        "CREATE TABLE IF NOT EXISTS rollup_cash ("
+        " period TEXT NOT NULL, period_start TEXT NOT NULL, mass TEXT NOT NULL, offering INTEGER NOT NULL,"
+        " deno INTEGER NOT NULL, qty INTEGER NOT NULL, amount INTEGER NOT NULL,"
+        " PRIMARY KEY (period, period_start, mass, offering, deno));"
+        "CREATE TABLE IF NOT EXISTS rollup_donors ("
+        " period TEXT NOT NULL, period_start TEXT NOT NULL, donor TEXT NOT NULL,"
+        " checks INTEGER NOT NULL, amount REAL NOT NULL,"
+        " PRIMARY KEY (period, period_start, donor));"
+        "CREATE TABLE IF NOT EXISTS rollup_watermarks (source TEXT PRIMARY KEY, recorded_at TEXT NOT NULL);")
+
+
+def period_bounds(dates, period):
+    """ (first day, last day) ISO strings of the periods containing the given dates """
+    periods = pd.to_datetime(pd.Series(sorted(set(dates)))).dt.to_period(PERIOD_FREQ[period]).unique()
+    return [(p.start_time.date().isoformat(), p.end_time.date().isoformat()) for p in periods]
+
+
+def changed_dates(connection, table, date_column, source):
+    """ Dates of the ledger rows recorded since the source's watermark, and the newest recorded_at among them """
+    row = connection.execute("SELECT recorded_at FROM rollup_watermarks WHERE source = ?", (source,)).fetchone()
+    watermark = row[0] if row else ""
+    # Rows recorded within the watermark's second are taken again; recomputing a period is idempotent
+    changed = connection.execute(
+        f"SELECT DISTINCT {date_column}, MAX(recorded_at) OVER () FROM {table} WHERE recorded_at >= ?",
+        (watermark,)).fetchall()
+    if not changed:
+        return [], None
+    return [changed_row[0] for changed_row in changed], changed[0][1]
+
+
+def load_periods(connection, query, bounds):
+    """ Ledger rows within any of the (first day, last day) bounds, as one DataFrame """
+    frames = [pd.read_sql_query(query, connection, params=bound) for bound in bounds]
+    return pd.concat(frames, ignore_index=True).drop_duplicates() if frames else pd.DataFrame()
+
+
+def replace_periods(connection, table, period, bounds, frame, columns):
+    """ Deletes the rollup rows of the recomputed periods and inserts their new rows """
+    connection.executemany(f"DELETE FROM {table} WHERE period = ? AND period_start = ?",
+                           [(period, start) for start, _ in bounds])
+    if len(frame):
+        placeholders = ", ".join("?" * (len(columns) + 1))
+        connection.executemany(f"INSERT INTO {table} (period, {', '.join(columns)}) VALUES ({placeholders})",
+                               [(period,) + tuple(row) for row in frame[columns].itertuples(index=False)])
+
+
+def update_cash_rollups(connection):
+    """ Recomputes the week/month/year cash rollups of the periods touched by counts recorded since the last update """
+    dates, newest = changed_dates(connection, "cash_counts", "mass_date", "cash_counts")
+    if not dates:
+        return 0
+    for period in PERIODS:
+        bounds = period_bounds(dates, period)
+        rows = load_periods(connection, "SELECT mass_date, mass, offering, deno, qty, amount FROM cash_counts"
+                                        " WHERE mass_date BETWEEN ? AND ?", bounds)
+        rows["period_start"] = (pd.to_datetime(rows["mass_date"]).dt.to_period(PERIOD_FREQ[period])
+                                .dt.start_time.dt.date.astype(str))
+        rollup = rows.groupby(["period_start", "mass", "offering", "deno"], as_index=False)[["qty", "amount"]].sum()
+        replace_periods(connection, "rollup_cash", period, bounds, rollup,
+                        ["period_start", "mass", "offering", "deno", "qty", "amount"])
+    connection.execute("INSERT OR REPLACE INTO rollup_watermarks (source, recorded_at) VALUES ('cash_counts', ?)", (newest,))
+    return len(dates)
+
+
+def update_donor_rollups(connection):
+    """ Recomputes the week/month/year per-donor check rollups of the periods touched by new checks """
+    dates, newest = changed_dates(connection, "checks", "scan_date", "checks")
+    if not dates:
+        return 0
+    for period in PERIODS:
+        bounds = period_bounds(dates, period)
+        rows = load_periods(connection, "SELECT scan_date, check_number, names, amount FROM checks"
+                                        " WHERE scan_date BETWEEN ? AND ?", bounds)
+        rows["period_start"] = (pd.to_datetime(rows["scan_date"]).dt.to_period(PERIOD_FREQ[period])
+                                .dt.start_time.dt.date.astype(str))
+        rows["donor"] = rows["names"].fillna("").str.strip().str.upper().replace("", "(unknown)")
+        rollup = (rows.groupby(["period_start", "donor"], as_index=False)
+                  .agg(checks=("check_number", "size"), amount=("amount", "sum")))
+        replace_periods(connection, "rollup_donors", period, bounds, rollup, ["period_start", "donor", "checks", "amount"])
+    connection.execute("INSERT OR REPLACE INTO rollup_watermarks (source, recorded_at) VALUES ('checks', ?)", (newest,))
+    return len(dates)
+
+
+def update_rollups(ledger):
+    """
+    Brings the rollups up to date with the ledger. Only the weeks, months and years containing a
+    count or check recorded since the previous update are recomputed.
+
+    Inputs:
+    - ledger (ledger.Ledger): Offering ledger holding the cash_counts and checks tables.
+
+    Outputs:
+    - changed (dict): Number of dates whose "cash" and "checks" periods were recomputed.
+    """
+    connection = ledger.connection
+    create_rollup_tables(connection)
+    with connection:
+        return {"cash": update_cash_rollups(connection), "checks": update_donor_rollups(connection)}
+
+
+## Export
+def write_table(workbook, title, columns, rows, amount_columns=(), deno_columns=(), total_columns=()):
+    """ Adds a sheet in the cash print style: merged bold title, bordered header and rows, Sub Total row """
+    sheet = workbook.create_sheet(title)
+    width = len(columns)
+    sheet.cell(row=1, column=1, value=title).font = Font(name=FONT_NAME, size=12, bold=True)
+    sheet.cell(row=1, column=1).alignment = Alignment(horizontal="center")
+    sheet.merge_cells(start_row=1, start_column=1, end_row=1, end_column=width)
+
+    for column, name in enumerate(columns, start=1):
+        cell = sheet.cell(row=3, column=column, value=name)
+        cell.font = Font(name=FONT_NAME, size=12, bold=True)
+        cell.alignment = Alignment(horizontal="center")
+        cell.border = CELL_BORDER
+        sheet.column_dimensions[get_column_letter(column)].width = max(12.8, len(str(name)) + 4)
+
+    for row_idx, row in enumerate(rows, start=4):
+        for column, value in enumerate(row, start=1):
+            cell = sheet.cell(row=row_idx, column=column, value=value)
+            cell.font = Font(name=FONT_NAME, size=12)
+            cell.border = CELL_BORDER
+            if column in amount_columns:
+                cell.number_format = AMOUNT_FORMAT
+            elif column in deno_columns:
+                cell.number_format = DENO_FORMAT
+            else:
+                cell.alignment = Alignment(horizontal="center")
+
+    total_row = len(rows) + 4
+    sheet.cell(row=total_row, column=1, value="Sub Total")
+    for column in range(1, width + 1):
+        cell = sheet.cell(row=total_row, column=column)
+        cell.font = Font(name=FONT_NAME, size=12)
+        cell.border = CELL_BORDER
+        if column in total_columns and rows:
+            letter = get_column_letter(column)
+            cell.value = f"=SUM({letter}4:{letter}{total_row - 1})"
+            cell.number_format = AMOUNT_FORMAT if column in amount_columns else "General"
+        cell.alignment = Alignment(horizontal="center") if column not in amount_columns else Alignment()
+    return sheet
+
+
+def export_rollups(ledger, output_file, start_date, end_date):
+    """
+    Writes the treasurer reports for a date range from the rollups: weekly totals by mass and offering,
+    monthly totals by denomination and annual check totals per donor.
+    """
+    connection = ledger.connection
+    bounds = (start_date.isoformat(), end_date.isoformat())
+    # Weeks (Monday to Sunday), months and years are included when any part of them falls in the range
+    month_bounds = (start_date.isoformat()[:7], end_date.isoformat()[:7])
+    year_bounds = (str(start_date.year), str(end_date.year))
+    weekly = pd.read_sql_query(
+        "SELECT period_start, mass, offering, SUM(amount) AS amount FROM rollup_cash WHERE period = 'week'"
+        " AND date(period_start, '+6 days') >= ? AND period_start <= ?"
+        " GROUP BY period_start, mass, offering ORDER BY period_start, mass, offering",
+        connection, params=bounds)
+    monthly = pd.read_sql_query(
+        "SELECT period_start, deno, SUM(qty) AS qty, SUM(amount) AS amount FROM rollup_cash WHERE period = 'month'"
+        " AND substr(period_start, 1, 7) BETWEEN ? AND ? GROUP BY period_start, deno ORDER BY period_start, deno",
+        connection, params=month_bounds)
+    donors = pd.read_sql_query(
+        "SELECT period_start, donor, checks, amount FROM rollup_donors WHERE period = 'year'"
+        " AND substr(period_start, 1, 4) BETWEEN ? AND ? ORDER BY period_start, amount DESC",
+        connection, params=year_bounds)
+
+    # Weekly: one row per week and mass, one column per offering
+    weekly_table = (weekly.pivot_table(index=["period_start", "mass"], columns="offering", values="amount",
+                                       aggfunc="sum", fill_value=0)
+                    .rename(columns=lambda offering: f"{offering} 차") if len(weekly) else pd.DataFrame())
+    weekly_rows = [(week, mass) + tuple(float(value) for value in values)
+                   for (week, mass), values in zip(weekly_table.index, weekly_table.to_numpy())]
+
+    workbook = Workbook()
+    workbook.remove(workbook.active)
+    offering_columns = list(weekly_table.columns) if len(weekly) else []
+    write_table(workbook, "주간 미사별 헌금", ["주 (월요일)", "미사"] + offering_columns, weekly_rows,
+                amount_columns=range(3, 3 + len(offering_columns)), total_columns=range(3, 3 + len(offering_columns)))
+    write_table(workbook, "월별 권종별 현금", ["월", "권종", "Qty", "Amount"],
+                [(month[:7], int(deno), int(qty), float(amount)) for month, deno, qty, amount in monthly.itertuples(index=False)],
+                amount_columns=(4,), deno_columns=(2,), total_columns=(3, 4))
+    write_table(workbook, "연간 헌금자별 수표", ["연도", "발행자", "수표 수", "금액"],
+                [(year[:4], donor, int(checks), float(amount)) for year, donor, checks, amount in donors.itertuples(index=False)],
+                amount_columns=(4,), total_columns=(3, 4))
+
+    temp_file = output_file + ".tmp.xlsx"
+    workbook.save(temp_file)
+    os.replace(temp_file, output_file)
+
+
+## Execution
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update the giving rollups from the offering ledger and export treasurer reports")
+    parser.add_argument('--ledger', metavar='file', default=DEFAULT_LEDGER_FILE, help=f'ledger file (or set {LEDGER_ENV})')
+    parser.add_argument('--export', metavar='file', default=None, help='write the weekly/monthly/annual reports to this xlsx file')
+    parser.add_argument('--start', metavar='YYYY-MM-DD', default=None, help='first date of the export (default: January 1st)')
+    parser.add_argument('--end', metavar='YYYY-MM-DD', default=None, help='last date of the export (default: today)')
+    args = parser.parse_args()
+
+    ledger = Ledger(args.ledger)
+    changed = update_rollups(ledger)
+    print(f"Rollups updated: {changed['cash']} cash dates and {changed['checks']} check dates recomputed")
+    if args.export:
+        end_date = date.fromisoformat(args.end) if args.end else date.today()
+        start_date = date.fromisoformat(args.start) if args.start else date(end_date.year, 1, 1)
+        export_rollups(ledger, args.export, start_date, end_date)
+        print(f"Exported {start_date} to {end_date} to {args.export}")
+    ledger.close()
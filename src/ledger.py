@@ -0,0 +1,336 @@
+## Load dependencies
+import argparse
+import csv
+import fnmatch
+import glob
+import os
+import re
+import sqlite3
+from datetime import date, datetime
+
+# Setting OFFERING_LEDGER=<file> moves the ledger for every program that records into it
+LEDGER_ENV = "OFFERING_LEDGER"
+DEFAULT_LEDGER_FILE = os.environ.get(LEDGER_ENV) or os.path.join(os.path.expanduser("~"), ".offering_ledger", "ledger.sqlite3")
+
+# 헌금보고서_01-05-2025_9시미사.xlsx -> date, mass
+REPORT_NAME = re.compile(r"헌금보고서_(\d{2}-\d{2}-\d{4})_(.+)미사\.xlsx$")
+# 20250101_2210_cash_summary.csv -> date, time of the count
+CASH_SUMMARY_NAME = re.compile(r"(\d{8})_(\d{4})_cash_summary\.csv$")
+# 2025-01-01_Cash_Print.xlsx -> date
+CASH_PRINT_NAME = re.compile(r"(\d{4}-\d{2}-\d{2})_Cash_Print\.xlsx$")
+# Check reports are copies of the formatter named after it, e.g., Check_Report_01-05-2025.xlsx; other workbooks
+# (templates, temporary files left by an interrupted save) are not imported as check reports
+CHECK_REPORT_PATTERN = "check*.xlsx"
+CHECK_FORMATTER_NAME = "Check_Table_Formatter.xlsx"
+
+
+class Ledger:
+    """
+    Local SQLite ledger of every cash count (DENO/QTY/AMT per mass and offering) and every check read.
+
+    Recording the same mass/offering, or the same check report on the same date, again replaces the
+    earlier rows, so re-running a count, a check report or a backfill never duplicates history. Checks are
+    kept per report and row: check numbers are only unique per donor, and several check reports may be made
+    on one date. Every record_* call is a single transaction of a few rows.
+    """
+
+    def __init__(self, ledger_file=DEFAULT_LEDGER_FILE):
+        os.makedirs(os.path.dirname(os.path.abspath(ledger_file)), exist_ok=True)
+        # Backfill workers may record at the same time; wait for each other's short transactions
+        self.connection = sqlite3.connect(ledger_file, timeout=30)
+        self.connection.executescript(
+            "CREATE TABLE IF NOT EXISTS cash_counts ("
+            " mass_date TEXT NOT NULL, mass TEXT NOT NULL, offering INTEGER NOT NULL,"
+            " deno INTEGER NOT NULL, qty INTEGER NOT NULL, amount INTEGER NOT NULL,"
+            " source TEXT, recorded_at TEXT NOT NULL,"
+            " PRIMARY KEY (mass_date, mass, offering, deno));"
+            "CREATE INDEX IF NOT EXISTS cash_counts_mass ON cash_counts (mass, mass_date);"
+            "CREATE INDEX IF NOT EXISTS cash_counts_offering ON cash_counts (offering, mass_date);"
+            "CREATE TABLE IF NOT EXISTS checks ("
+            " scan_date TEXT NOT NULL, source TEXT NOT NULL DEFAULT '', row_index INTEGER NOT NULL,"
+            " check_number TEXT NOT NULL, names TEXT, amount REAL, recorded_at TEXT NOT NULL,"
+            " PRIMARY KEY (scan_date, source, row_index));")
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(checks)")]
+        if "row_index" not in columns:
+            self.migrate_checks()
+        # giving_rollups finds the rows recorded since its last update by recorded_at
+        self.connection.executescript(
+            "CREATE INDEX IF NOT EXISTS cash_counts_recorded ON cash_counts (recorded_at);"
+            "CREATE INDEX IF NOT EXISTS checks_recorded ON checks (recorded_at);")
+
+    def migrate_checks(self):
+        """ Moves the checks of a ledger keyed by (date, check number) into the per-report table """
+        with self.connection:
+            self.connection.executescript(
+                "ALTER TABLE checks RENAME TO checks_by_number;"
+                "CREATE TABLE checks ("
+                " scan_date TEXT NOT NULL, source TEXT NOT NULL DEFAULT '', row_index INTEGER NOT NULL,"
+                " check_number TEXT NOT NULL, names TEXT, amount REAL, recorded_at TEXT NOT NULL,"
+                " PRIMARY KEY (scan_date, source, row_index));"
+                "INSERT INTO checks (scan_date, source, row_index, check_number, names, amount, recorded_at)"
+                " SELECT scan_date, COALESCE(source, ''), rowid, check_number, names, amount, recorded_at"
+                " FROM checks_by_number;"
+                "DROP TABLE checks_by_number;")
+
+    def record_cash_count(self, mass_date, mass, offering, rows, source=None):
+        """
+        Records one offering's count.
+
+        Inputs:
+        - mass_date (datetime.date): Date of the mass.
+        - mass (str): Mass time, e.g., "9시".
+        - offering (int): 1 or 2.
+        - rows (iterable of (int, int, int)): (DENO, QTY, AMT) per denomination.
+        - source (str or None): File the count came from.
+        """
+        now = datetime.now().isoformat(timespec="seconds")
+        with self.connection:
+            self.connection.execute("DELETE FROM cash_counts WHERE mass_date = ? AND mass = ? AND offering = ?",
+                                    (mass_date.isoformat(), mass, offering))
+            self.connection.executemany(
+                "INSERT INTO cash_counts (mass_date, mass, offering, deno, qty, amount, source, recorded_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(mass_date.isoformat(), mass, offering, deno, qty, amt, source, now) for deno, qty, amt in rows])
+
+    def record_checks(self, scan_date, rows, source=None):
+        """
+        Records a check report's rows, (check number, names, amount) each, under the date they were read.
+        The rows recorded earlier for the same report and date are replaced; other reports are kept.
+        """
+        now = datetime.now().isoformat(timespec="seconds")
+        with self.connection:
+            self.connection.execute("DELETE FROM checks WHERE scan_date = ? AND source = ?",
+                                    (scan_date.isoformat(), source or ""))
+            self.connection.executemany(
+                "INSERT INTO checks (scan_date, source, row_index, check_number, names, amount, recorded_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(scan_date.isoformat(), source or "", row_index, str(check_number), names, amount, now)
+                 for row_index, (check_number, names, amount) in enumerate(rows)])
+
+    def find_imported_count(self, mass_date, rows):
+        """
+        Returns the (mass, offering) of a count imported on mass_date from a cash summary CSV or cash print
+        with the same denomination rows (rows with QTY and AMT 0 aside), or None. A CSV and the cash print
+        made from it hold the same count; counts from offering reports and live counts are never matched,
+        since two masses may count the same bills.
+        """
+        recorded = {}
+        for mass, offering, deno, qty, amount, source in self.connection.execute(
+                "SELECT mass, offering, deno, qty, amount, source FROM cash_counts WHERE mass_date = ?",
+                (mass_date.isoformat(),)):
+            name = os.path.basename(source or "")
+            if (qty or amount) and (CASH_SUMMARY_NAME.search(name) or CASH_PRINT_NAME.search(name)):
+                recorded.setdefault((mass, offering), set()).add((deno, qty, amount))
+        counted = {(int(deno), int(qty), int(amt)) for deno, qty, amt in rows if qty or amt}
+        return next((key for key, recorded_rows in recorded.items() if recorded_rows == counted), None)
+
+    def totals(self, start_date, end_date):
+        """ Cash totals per mass and offering, and the check total, between two dates (inclusive) """
+        cash = self.connection.execute(
+            "SELECT mass, offering, COUNT(DISTINCT mass_date), SUM(amount) FROM cash_counts"
+            " WHERE mass_date BETWEEN ? AND ? GROUP BY mass, offering ORDER BY mass, offering",
+            (start_date.isoformat(), end_date.isoformat())).fetchall()
+        checks = self.connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(amount), 0) FROM checks WHERE scan_date BETWEEN ? AND ?",
+            (start_date.isoformat(), end_date.isoformat())).fetchone()
+        return cash, checks
+
+    def close(self):
+        self.connection.close()
+
+
+def add_ledger_arguments(parser):
+    """ Adds the --ledger / --no_ledger options """
+    parser.add_argument('--ledger', metavar='file', default=DEFAULT_LEDGER_FILE, help=f'ledger file (or set {LEDGER_ENV})')
+    parser.add_argument('--no_ledger', action='store_true', help='do not record the results in the ledger')
+
+
+def open_ledger(args):
+    """ Opens the ledger selected by the parsed options, or returns None with --no_ledger """
+    if args.no_ledger:
+        return None
+    return Ledger(args.ledger)
+
+
+## Import of the existing history
+def read_cash_summary_csv(csv_path):
+    """ Reads a DENO,QTY,AMT cash summary CSV (ending with a TOTAL row) into (DENO, QTY, AMT) rows """
+    with open(csv_path, newline="", encoding="utf-8-sig") as csv_file:
+        return [(int(row["DENO"]), int(row["QTY"]), int(row["AMT"]))
+                for row in csv.DictReader(csv_file) if row["DENO"].strip().upper() != "TOTAL"]
+
+
+def read_report_offerings(report_path):
+    """
+    Reads the cash counts back from an offering report or cash print. The offering columns are found from
+    the "Qty" header cells (1차, 2차, then 특별 헌금 as offering 3) with the denominations in the column left
+    of the first one; without that header, the layout process_pdf fills in (QTY/Amount in columns C-D and
+    E-F of rows 7-13) is read. Returns ({offering: rows}, mass time in the header or None), leaving out
+    offerings with no counts.
+    """
+    from openpyxl import load_workbook
+    from bc40_report import DENOMINATIONS
+
+    sheet = load_workbook(report_path, read_only=True, data_only=True).active
+    sheet_rows = list(sheet.iter_rows(min_row=1, max_row=40, values_only=True))
+
+    # Mass time written in the cell right of the "시간:" label, if any
+    mass = None
+    for row in sheet_rows:
+        labels = [str(value).strip() if value is not None else "" for value in row]
+        if "시간:" in labels and labels.index("시간:") + 1 < len(row):
+            value = labels[labels.index("시간:") + 1]
+            mass = value if value and not value.endswith(":") else None
+            break
+
+    header_index = next((index for index, row in enumerate(sheet_rows)
+                         if any(str(value).strip().lower() == "qty" for value in row if value is not None)), None)
+    if header_index is not None:
+        qty_columns = [column for column, value in enumerate(sheet_rows[header_index])
+                       if value is not None and str(value).strip().lower() == "qty"]
+        deno_column = qty_columns[0] - 1
+        deno_rows = []
+        for row in sheet_rows[header_index + 1:]:
+            if not isinstance(row[deno_column], (int, float)):
+                break
+            deno_rows.append(row)
+        columns = [(offering, column) for offering, column in enumerate(qty_columns, start=1)]
+    else:
+        # Fixed layout (cash_tally.Tally.write): rows 7-13 hold the denominations 1 to 100, columns C-D and E-F the offerings
+        deno_rows = [(deno,) + tuple(row[2:6]) for deno, row in zip(DENOMINATIONS, sheet_rows[6:13])]
+        deno_column = 0
+        columns = [(1, 1), (2, 3)]
+
+    offerings = {}
+    for offering, qty_column in columns:
+        rows = []
+        for row in deno_rows:
+            qty, amount = row[qty_column], row[qty_column + 1]
+            if qty is not None or amount is not None:
+                rows.append((int(row[deno_column]), int(qty or 0), int(amount or 0)))
+        if rows:
+            offerings[offering] = rows
+    return offerings, mass
+
+
+def read_check_report(report_path):
+    """ Reads the (check number, names, amount) rows back from a check report (columns J-L from row 4) """
+    from openpyxl import load_workbook
+
+    sheet = load_workbook(report_path, read_only=True, data_only=True).active
+    rows = []
+    for check_number, names, amount in sheet.iter_rows(min_row=4, min_col=10, max_col=12, values_only=True):
+        if check_number is None:
+            break
+        rows.append((check_number, names, amount))
+    return rows
+
+
+def is_check_report(name, pattern=CHECK_REPORT_PATTERN):
+    """ True for a file name matching the check report pattern (case-insensitive), other than the formatter itself """
+    return fnmatch.fnmatchcase(name.lower(), pattern.lower()) and name.lower() != CHECK_FORMATTER_NAME.lower()
+
+
+def import_history(ledger, paths, mass=None, offering=1, check_date=None, check_pattern=CHECK_REPORT_PATTERN):
+    """
+    Imports existing cash summary CSVs, offering reports, cash prints and check reports into the ledger.
+
+    A cash summary CSV or cash print count whose rows were already imported for the same date from another
+    CSV or cash print (the CSV and the cash print made from it) is not recorded again. Offering reports are
+    always recorded.
+
+    Inputs:
+    - ledger (Ledger): Ledger to record into.
+    - paths (list of str): Files, or folders searched recursively for *.csv and *.xlsx files.
+    - mass (str or None): Mass recorded for cash summary CSVs (required for them: the time in their file
+      name is the time of the count, not the mass) and cash prints (default: the time in the header, else
+      "unknown"). Without it, cash summary CSVs are skipped.
+    - offering (int): Offering recorded for cash summary CSVs.
+    - check_date (datetime.date or None): Date recorded for check reports (default: the file's modification date).
+    - check_pattern (str): File name pattern (glob, case-insensitive) of the check reports.
+
+    Outputs:
+    - counts (dict): Number of "cash" offerings, "checks", "duplicate" counts and "skipped" files.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "**", "*.csv"), recursive=True)))
+            files.extend(sorted(glob.glob(os.path.join(path, "**", "*.xlsx"), recursive=True)))
+        else:
+            files.append(path)
+
+    def record(mass_date, count_mass, count_offering, rows, file_path, check_duplicate=True):
+        duplicate = ledger.find_imported_count(mass_date, rows) if check_duplicate else None
+        if duplicate is not None and duplicate != (count_mass, count_offering):
+            print(f"{file_path}: same count as {duplicate[0]} offering {duplicate[1]} on {mass_date}; not recorded again")
+            counts["duplicate"] += 1
+            return
+        ledger.record_cash_count(mass_date, count_mass, count_offering, rows, file_path)
+        counts["cash"] += 1
+
+    counts = {"cash": 0, "checks": 0, "duplicate": 0, "skipped": 0}
+    for file_path in files:
+        name = os.path.basename(file_path)
+        csv_match = CASH_SUMMARY_NAME.search(name)
+        report_match = REPORT_NAME.search(name)
+        print_match = CASH_PRINT_NAME.search(name)
+        if csv_match:
+            if not mass:
+                print(f"{file_path}: skipped, give the mass of cash summary CSVs with --mass")
+                counts["skipped"] += 1
+                continue
+            mass_date = datetime.strptime(csv_match.group(1), "%Y%m%d").date()
+            record(mass_date, mass, offering, read_cash_summary_csv(file_path), file_path)
+        elif report_match or print_match:
+            if report_match:
+                mass_date = datetime.strptime(report_match.group(1), "%m-%d-%Y").date()
+            else:
+                mass_date = date.fromisoformat(print_match.group(1))
+            offerings, header_mass = read_report_offerings(file_path)
+            report_mass = report_match.group(2) if report_match else (mass or header_mass or "unknown")
+            for report_offering, rows in offerings.items():
+                record(mass_date, str(report_mass), report_offering, rows, file_path, check_duplicate=not report_match)
+        elif is_check_report(name, check_pattern):
+            rows = read_check_report(file_path)
+            if not rows:
+                counts["skipped"] += 1
+                continue
+            scan_date = check_date or date.fromtimestamp(os.path.getmtime(file_path))
+            ledger.record_checks(scan_date, rows, file_path)
+            counts["checks"] += len(rows)
+        else:
+            counts["skipped"] += 1
+    return counts
+
+
+## Execution
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offering ledger: import existing history and query totals")
+    parser.add_argument('--ledger', metavar='file', default=DEFAULT_LEDGER_FILE, help=f'ledger file (or set {LEDGER_ENV})')
+    commands = parser.add_subparsers(dest='command', required=True)
+    import_parser = commands.add_parser('import', help='import cash summary CSVs, offering reports, cash prints and check reports')
+    import_parser.add_argument('paths', nargs='+', metavar='path', help='files, or folders searched recursively')
+    import_parser.add_argument('--mass', default=None, help='mass recorded for cash summary CSVs (required for them) and cash prints (default: from the header)')
+    import_parser.add_argument('--offering', type=int, default=1, choices=[1, 2], help='offering recorded for cash summary CSVs')
+    import_parser.add_argument('--check_date', metavar='YYYY-MM-DD', default=None, help='date recorded for check reports (default: file date)')
+    import_parser.add_argument('--check_pattern', metavar='glob', default=CHECK_REPORT_PATTERN, help=f'file names of the check reports (default: {CHECK_REPORT_PATTERN})')
+    totals_parser = commands.add_parser('totals', help='print cash totals per mass and offering, and the check total')
+    totals_parser.add_argument('--start', metavar='YYYY-MM-DD', required=True, help='first date')
+    totals_parser.add_argument('--end', metavar='YYYY-MM-DD', required=True, help='last date')
+    args = parser.parse_args()
+
+    ledger = Ledger(args.ledger)
+    if args.command == 'import':
+        check_date = date.fromisoformat(args.check_date) if args.check_date else None
+        counts = import_history(ledger, args.paths, args.mass, args.offering, check_date, args.check_pattern)
+        print(f"Imported {counts['cash']} cash counts and {counts['checks']} checks ({counts['duplicate']} duplicate counts,"
+              f" {counts['skipped']} files skipped) into {args.ledger}")
+    else:
+        cash, checks = ledger.totals(date.fromisoformat(args.start), date.fromisoformat(args.end))
+        print(f"{'mass':<10}{'offering':>9}{'masses':>8}{'amount':>12}")
+        for mass, offering, masses, amount in cash:
+            print(f"{mass:<10}{offering:>9}{masses:>8}{amount:>12,}")
+        print(f"Cash total: {sum(row[3] for row in cash):,}")
+        print(f"Checks: {checks[0]}, total {checks[1]:,.2f}")
+    ledger.close()
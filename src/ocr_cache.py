@@ -0,0 +1,101 @@
+## Load dependencies
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_FILE = os.path.join(os.path.expanduser("~"), ".check_scan", "ocr_cache.sqlite3")
+DEFAULT_CACHE_MAX_MB = 64
+
+
+def image_hash(image_path):
+    """ Returns the SHA-256 hex digest of an image file's bytes """
+    digest = hashlib.sha256()
+    with open(image_path, "rb") as image_file:
+        for chunk in iter(lambda: image_file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class OcrCache:
+    """
+    Persistent cache of check OCR results, keyed by image content hash and a namespace naming the
+    models and settings that produced them (so a backend or option change never reuses stale reads).
+    Least recently used entries are evicted once the stored results exceed max_mb.
+
+    The cache may be used from several threads (e.g., the check pipeline's reader threads look images up
+    while the writer stores results); its methods take turns on the one connection.
+    """
+
+    def __init__(self, cache_file, namespace, max_mb=DEFAULT_CACHE_MAX_MB):
+        os.makedirs(os.path.dirname(os.path.abspath(cache_file)), exist_ok=True)
+        self.connection = sqlite3.connect(cache_file, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS ocr_results ("
+            " namespace TEXT NOT NULL, image_hash TEXT NOT NULL, result TEXT NOT NULL,"
+            " size INTEGER NOT NULL, last_used REAL NOT NULL,"
+            " PRIMARY KEY (namespace, image_hash))")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS ocr_results_last_used ON ocr_results (last_used)")
+        self.namespace = namespace
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, content_hash):
+        """ Returns the cached (names, amount) for an image hash, or None on a miss """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT result FROM ocr_results WHERE namespace = ? AND image_hash = ?",
+                (self.namespace, content_hash)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.connection.execute(
+                "UPDATE ocr_results SET last_used = ? WHERE namespace = ? AND image_hash = ?",
+                (time.time(), self.namespace, content_hash))
+        names, amount = json.loads(row[0])
+        return names, amount
+
+    def put_many(self, entries):
+        """ Stores (image hash, names, amount) entries and commits them, so a crash keeps the finished reads """
+        now = time.time()
+        rows = []
+        for content_hash, names, amount in entries:
+            result = json.dumps([names, amount])
+            rows.append((self.namespace, content_hash, result, len(result) + len(content_hash), now))
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO ocr_results (namespace, image_hash, result, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                rows)
+            self.connection.commit()
+
+    def evict(self):
+        """ Deletes the least recently used entries until the cache fits in max_mb """
+        total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM ocr_results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        stale = []
+        for namespace, content_hash, size in self.connection.execute(
+                "SELECT namespace, image_hash, size FROM ocr_results ORDER BY last_used"):
+            stale.append((namespace, content_hash))
+            freed += size
+            if freed >= excess:
+                break
+        self.connection.executemany("DELETE FROM ocr_results WHERE namespace = ? AND image_hash = ?", stale)
+
+    def flush(self):
+        """ Evicts down to the size limit and commits """
+        with self.lock:
+            self.evict()
+            self.connection.commit()
+
+    def close(self):
+        """ Evicts down to the size limit and commits the run's results """
+        self.flush()
+        self.connection.close()
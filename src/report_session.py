@@ -0,0 +1,47 @@
+## Load dependencies
+import os
+import tempfile
+import time
+from openpyxl import load_workbook
+from stage_trace import span
+
+
+class ReportSession:
+    """
+    One mass's offering report workbook, kept in memory while its offerings are filled in.
+
+    The workbook is read once (the existing report, or else the template) and written once by save(),
+    atomically: it is saved to a temporary file next to the report and renamed over it, so an
+    interrupted save never leaves a half-written report behind.
+    """
+
+    def __init__(self, report_path, template_path, fresh=False):
+        self.report_path = report_path
+        # Continue an existing report (e.g., the first offering was saved before a restart),
+        # unless the report is rebuilt from the template
+        source = report_path if os.path.exists(report_path) and not fresh else template_path
+        open_start = time.perf_counter()
+        with span("load_workbook", report=os.path.basename(report_path)):
+            self.workbook = load_workbook(source)
+        self.open_seconds = time.perf_counter() - open_start
+        self.save_seconds = None
+        self.sheet = self.workbook.active
+        # Offerings filled in since the last save
+        self.unsaved = False
+
+    def save(self):
+        """ Writes the workbook to a temporary file in the report's folder, then renames it over the report """
+        save_start = time.perf_counter()
+        with span("workbook save", report=os.path.basename(self.report_path)):
+            fd, temp_path = tempfile.mkstemp(suffix=".xlsx", dir=os.path.dirname(os.path.abspath(self.report_path)))
+            os.close(fd)
+            try:
+                self.workbook.save(temp_path)
+                os.replace(temp_path, self.report_path)
+            except BaseException:
+                os.remove(temp_path)
+                raise
+        self.save_seconds = time.perf_counter() - save_start
+        self.unsaved = False
+        print(f"{os.path.basename(self.report_path)}: opened in {self.open_seconds * 1000:.0f} ms, "
+              f"saved in {self.save_seconds * 1000:.0f} ms")
@@ -0,0 +1,136 @@
+## Per-stage timing spans, exported as a Chrome trace (chrome://tracing, https://ui.perfetto.dev)
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+# Setting OFFERING_TRACE=<trace file> switches tracing on for every process that imports this module
+TRACE_ENV = "OFFERING_TRACE"
+
+# Recorded events while tracing is on; None while it is off
+events = None
+trace_file = None
+
+# Returned by span() while tracing is off, so a disabled span costs one call and a None check
+NULL_SPAN = nullcontext()
+
+# perf_counter has no fixed origin; shift it onto the wall clock so spans from different processes line up
+CLOCK_OFFSET_NS = time.time_ns() - time.perf_counter_ns()
+
+
+class Span:
+    """ Context manager recording one complete ("X") trace event """
+
+    __slots__ = ("name", "args", "start_ns")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end_ns = time.perf_counter_ns()
+        events.append({
+            "name": self.name,
+            "ph": "X",
+            "ts": (self.start_ns + CLOCK_OFFSET_NS) / 1000,
+            "dur": (end_ns - self.start_ns) / 1000,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": self.args,
+        })
+        return False
+
+
+def enable(path):
+    """ Switches tracing on, exporting to path; child processes started afterwards inherit it """
+    global events, trace_file
+    if events is None:
+        events = []
+    trace_file = path
+    os.environ[TRACE_ENV] = path
+
+
+def enabled():
+    return events is not None
+
+
+def span(name, **args):
+    """
+    Times a stage: `with span("trocr generate", batch=8): ...`.
+    The keyword arguments are stored with the event (check number, offering, ...).
+    """
+    if events is None:
+        return NULL_SPAN
+    return Span(name, args)
+
+
+def drain():
+    """ Returns and forgets the events recorded so far (worker processes send them back with their results) """
+    if events is None:
+        return []
+    drained = events[:]
+    del events[:]
+    return drained
+
+
+def extend(more_events):
+    """ Adds events recorded in another process """
+    if events is not None:
+        events.extend(more_events)
+
+
+def summary():
+    """ Per-stage count, total, mean, p95 and max duration in ms, slowest total first """
+    durations = {}
+    for event in events or []:
+        durations.setdefault(event["name"], []).append(event["dur"] / 1000)
+    rows = []
+    for name, values in durations.items():
+        values.sort()
+        rows.append({
+            "stage": name,
+            "count": len(values),
+            "total_ms": sum(values),
+            "mean_ms": sum(values) / len(values),
+            "p95_ms": values[min(len(values) - 1, int(len(values) * 0.95))],
+            "max_ms": values[-1],
+        })
+    return sorted(rows, key=lambda row: row["total_ms"], reverse=True)
+
+
+def print_summary():
+    """ Prints summary() as a table """
+    print(f"{'stage':<28}{'count':>7}{'total ms':>12}{'mean ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for row in summary():
+        print(f"{row['stage']:<28}{row['count']:>7}{row['total_ms']:>12.1f}{row['mean_ms']:>10.1f}"
+              f"{row['p95_ms']:>10.1f}{row['max_ms']:>10.1f}")
+
+
+def export(path=None):
+    """ Writes the recorded events as a Chrome trace JSON file """
+    with open(path or trace_file, "w") as trace:
+        json.dump({"traceEvents": events or [], "displayTimeUnit": "ms"}, trace)
+
+
+def finish():
+    """ Exports the trace and prints the summary table, if tracing is on """
+    if events is None:
+        return
+    export()
+    print_summary()
+    print(f"Trace written to {trace_file}")
+
+
+def reset():
+    """ Drops the events recorded so far, so the next finish() only covers what follows (e.g., the next job) """
+    if events is not None:
+        events.clear()
+
+
+if os.environ.get(TRACE_ENV):
+    enable(os.environ[TRACE_ENV])
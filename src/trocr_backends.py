@@ -0,0 +1,106 @@
+## Load dependencies
+import os
+
+# torch and transformers are imported by the functions that load models, so BACKENDS and backend_id are
+# available without them
+
+TROCR_MODEL_NAME = 'microsoft/trocr-base-handwritten'
+
+# Recognition backends for the legal-amount reader
+#  - torch: the fp32 PyTorch model
+#  - int8:  the PyTorch model with its Linear layers dynamically quantized to int8
+#  - onnx:  the encoder/decoder exported to ONNX and run with ONNX Runtime on the CPU
+BACKENDS = ['torch', 'int8', 'onnx']
+
+# Subdirectory of the model directory holding the exported ONNX encoder/decoder
+ONNX_SUBDIR = 'onnx'
+
+
+def backend_id(backend, model_dir=None):
+    """ Identifies a backend and its weights, e.g., "int8:microsoft/trocr-base-handwritten" """
+    return f"{backend}:{model_dir or TROCR_MODEL_NAME}"
+
+
+def export_onnx(model_dir, onnx_dir, num_threads=None):
+    """
+    Exports a local TrOCR checkpoint to an ONNX encoder/decoder pair and returns the loaded ONNX Runtime model.
+
+    Inputs:
+    - model_dir (str): Directory of the PyTorch checkpoint (config.json, weights, processor files).
+    - onnx_dir (str): Directory to write encoder_model.onnx / decoder_model.onnx and the processor files to.
+    - num_threads (int or None): ONNX Runtime intra-op threads, None for the runtime default.
+
+    Outputs:
+    - model (optimum.onnxruntime.ORTModelForVision2Seq): Model exposing the same generate() as the PyTorch one.
+    """
+    from optimum.onnxruntime import ORTModelForVision2Seq
+    from transformers import TrOCRProcessor
+
+    model = ORTModelForVision2Seq.from_pretrained(model_dir, export=True, local_files_only=True,
+                                                  session_options=onnx_session_options(num_threads))
+    model.save_pretrained(onnx_dir)
+    TrOCRProcessor.from_pretrained(model_dir, local_files_only=True).save_pretrained(onnx_dir)
+    return model
+
+
+def onnx_session_options(num_threads=None):
+    """ ONNX Runtime session options, capped to num_threads intra-op threads when given """
+    import onnxruntime
+
+    options = onnxruntime.SessionOptions()
+    if num_threads:
+        options.intra_op_num_threads = num_threads
+        options.inter_op_num_threads = 1
+    return options
+
+
+def load_trocr(backend='torch', model_dir=None, num_threads=None):
+    """
+    Loads the TrOCR processor and the model of the chosen recognition backend.
+
+    With model_dir the weights are only read from that local directory (no network access). For the
+    onnx backend the exported encoder/decoder is read from <model_dir>/onnx, and exported there first
+    if it does not exist yet.
+
+    Inputs:
+    - backend (str): One of BACKENDS.
+    - model_dir (str or None): Local model directory; None downloads/uses the Hugging Face cache.
+    - num_threads (int or None): CPU threads for the onnx backend (torch threads are set by the caller).
+
+    Outputs:
+    - processor (TrOCRProcessor): Preprocessor for the TrOCR model.
+    - model (object): Model with a generate(pixel_values, max_new_tokens=...) method returning token ids.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown TrOCR backend '{backend}', expected one of {BACKENDS}")
+    from transformers import TrOCRProcessor, VisionEncoderDecoderModel
+
+    source = model_dir or TROCR_MODEL_NAME
+    local_files_only = model_dir is not None
+
+    if backend == 'onnx':
+        from optimum.onnxruntime import ORTModelForVision2Seq
+
+        if model_dir is None:
+            raise ValueError("The onnx backend needs a local --model_dir to export to and load from")
+        onnx_dir = os.path.join(model_dir, ONNX_SUBDIR)
+        if os.path.exists(os.path.join(onnx_dir, 'encoder_model.onnx')):
+            model = ORTModelForVision2Seq.from_pretrained(onnx_dir, local_files_only=True,
+                                                          session_options=onnx_session_options(num_threads))
+        else:
+            print(f"Exporting TrOCR to ONNX in {onnx_dir}...")
+            model = export_onnx(model_dir, onnx_dir, num_threads)
+        processor = TrOCRProcessor.from_pretrained(source, use_fast=True, local_files_only=local_files_only)
+        return processor, model
+
+    processor = TrOCRProcessor.from_pretrained(source, use_fast=True, local_files_only=local_files_only)
+    model = VisionEncoderDecoderModel.from_pretrained(source, local_files_only=local_files_only)
+    model.eval()
+
+    if backend == 'int8':
+        import torch
+
+        # Dynamic quantization: int8 weights for every Linear layer, activations quantized on the fly
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    return processor, model
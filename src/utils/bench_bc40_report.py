@@ -0,0 +1,62 @@
+## Benchmark: BC-40 report parsing, word-position parser vs. pdfplumber's generic table extraction
+import argparse
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+import pdfplumber
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bc40_report import BC40LayoutError, parse_table, parse_words, validate_rows
+
+
+def time_parser(pdf_path, parser, repeat):
+    """ Opens the PDF and parses its first page repeat times; returns (per-run ms list, last result or error) """
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with pdfplumber.open(pdf_path) as pdf:
+            try:
+                rows, total = parser(pdf.pages[0])
+                validate_rows(rows, total)
+                result = (sorted(rows), total)
+            except BC40LayoutError as error:
+                result = error
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings, result
+
+
+## Execution
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the BC-40 word-position parser with pdfplumber extract_table")
+    parser.add_argument('pdfs', nargs='+', metavar='pdf', help='BC-40 report PDFs, or directories holding them')
+    parser.add_argument('--repeat', type=int, default=5, help='parses per PDF and parser')
+    args = parser.parse_args()
+
+    pdf_files = []
+    for path in args.pdfs:
+        pdf_files.extend(sorted(glob.glob(os.path.join(path, "*.pdf"))) if os.path.isdir(path) else [path])
+
+    print(f"{'pdf':<32}{'words ms':>10}{'table ms':>10}{'speedup':>9}  result")
+    all_words_ms, all_table_ms = [], []
+    for pdf_file in pdf_files:
+        words_ms, words_result = time_parser(pdf_file, parse_words, args.repeat)
+        table_ms, table_result = time_parser(pdf_file, parse_table, args.repeat)
+        all_words_ms.extend(words_ms)
+        all_table_ms.extend(table_ms)
+
+        if isinstance(words_result, BC40LayoutError):
+            result = f"word parser failed: {words_result}"
+        elif words_result != table_result:
+            result = f"MISMATCH with extract_table: {table_result}"
+        else:
+            result = f"ok, total {words_result[1]}"
+        print(f"{os.path.basename(pdf_file)[:31]:<32}{np.median(words_ms):>10.1f}{np.median(table_ms):>10.1f}"
+              f"{np.median(table_ms) / np.median(words_ms):>8.1f}x  {result}")
+
+    if pdf_files:
+        print(f"Median over {len(pdf_files)} PDFs: word parser {np.median(all_words_ms):.1f} ms, "
+              f"extract_table {np.median(all_table_ms):.1f} ms")
@@ -0,0 +1,257 @@
+## Synthetic-check throughput benchmark for check_scan.py
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+# Run offline: models must come from the local caches / --model_dir
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+from openpyxl import Workbook
+from check_scan import (EASYOCR_MODEL_DIR, decode_check_batch, list_check_files, load_models, ocr_check_batch, peak_memory_mb,
+                        write_check_report)
+from trocr_backends import BACKENDS
+
+FIRST_NAMES = ["JOHN", "MARY", "DAVID", "GRACE", "PAUL", "SARAH", "JAMES", "ANNA", "PETER", "HELEN"]
+LAST_NAMES = ["KIM", "LEE", "PARK", "CHOI", "JUNG", "KANG", "CHO", "YOON", "JANG", "LIM"]
+STREETS = ["MAIN ST", "OAK AVE", "MAPLE DR", "PARK RD", "ELM ST", "HILL BLVD"]
+CITIES = ["LOS ANGELES, CA 90010", "FULLERTON, CA 92831", "IRVINE, CA 92618", "TORRANCE, CA 90501"]
+AMOUNTS = [5, 10, 20, 25, 30, 40, 50, 60, 75, 100, 120, 150, 200, 250, 300, 500, 1000, 1200]
+
+ONES = ["", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten", "eleven", "twelve",
+        "thirteen", "fourteen", "fifteen", "sixteen", "seventeen", "eighteen", "nineteen"]
+TENS = ["", "", "twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety"]
+
+# Check size in pixels at 300 dpi (6" x 2.75")
+CHECK_SIZE = (1800, 825)
+
+
+def amount_words(amount):
+    """ Writes a whole-dollar amount below 10,000 in words, e.g., 125 -> "one hundred twenty five" """
+    words = []
+    if amount >= 1000:
+        words += [ONES[amount // 1000], "thousand"]
+        amount %= 1000
+    if amount >= 100:
+        words += [ONES[amount // 100], "hundred"]
+        amount %= 100
+    if amount >= 20:
+        words.append(TENS[amount // 10])
+        amount %= 10
+    if amount:
+        words.append(ONES[amount])
+    return " ".join(words)
+
+
+def load_font(size, names=("arial.ttf", "DejaVuSans.ttf")):
+    """ Returns the first available TrueType font of the given size, or PIL's built-in font """
+    for name in names:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size)
+
+
+def render_check(names, address, amount, rng):
+    """
+    Renders one synthetic check: printed names and address at the top left, the numeric amount in the
+    courtesy box, the amount in words on the legal line, and scanner noise.
+    """
+    width, height = CHECK_SIZE
+    page = Image.new("L", CHECK_SIZE, 255)
+    draw = ImageDraw.Draw(page)
+    printed = load_font(34)
+    handwritten = load_font(46, ("segoesc.ttf", "comic.ttf", "DejaVuSans-Oblique.ttf", "arial.ttf"))
+
+    # Names and address (top-left corner)
+    y = int(height * 0.04)
+    for line in [names] + address:
+        draw.text((int(width * 0.04), y), line, font=printed, fill=0)
+        y += 42
+
+    # Courtesy box with the numeric amount
+    box = (int(width * 0.76), int(height * 0.33), int(width * 0.96), int(height * 0.43))
+    draw.rectangle(box, outline=0, width=2)
+    draw.text((box[0] - 40, box[1] + 12), "$", font=printed, fill=0)
+    draw.text((box[0] + 20, box[1] + 8), f"{amount}.00", font=handwritten, fill=0)
+
+    # Legal-amount line: handwriting, printed rule and "DOLLARS"
+    line_y = int(height * 0.55)
+    draw.text((int(width * 0.06) + rng.randint(0, 30), int(height * 0.46)), amount_words(amount).title(),
+              font=handwritten, fill=0)
+    draw.line((int(width * 0.05), line_y, int(width * 0.84), line_y), fill=0, width=2)
+    draw.text((int(width * 0.85), line_y - 36), "DOLLARS", font=printed, fill=0)
+
+    # Signature line and memo
+    draw.line((int(width * 0.55), int(height * 0.85), int(width * 0.95), int(height * 0.85)), fill=0, width=2)
+    draw.text((int(width * 0.05), int(height * 0.8)), "MEMO", font=printed, fill=0)
+
+    # Scanner noise
+    pixels = np.asarray(page, dtype=np.int16) + np.random.default_rng(rng.randint(0, 2 ** 31)).normal(0, 12, (height, width))
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).convert("RGB")
+
+
+def generate_checks(out_dir, count, seed=0):
+    """
+    Writes count synthetic checks as <out_dir>/Check_<number>.Front.tif, the naming process_checks expects,
+    plus truth.json with the names and amount of each check number.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    truth = {}
+    for check_number in range(1001, 1001 + count):
+        last_name = rng.choice(LAST_NAMES)
+        names = f"{rng.choice(FIRST_NAMES)} {last_name}"
+        if rng.random() < 0.4:
+            names += f" OR {rng.choice(FIRST_NAMES)} {last_name}"
+        address = [f"{rng.randint(100, 9999)} {rng.choice(STREETS)}", rng.choice(CITIES)]
+        amount = rng.choice(AMOUNTS)
+
+        render_check(names, address, amount, rng).save(os.path.join(out_dir, f"Check_{check_number}.Front.tif"))
+        truth[str(check_number)] = {"names": names, "amount": amount}
+
+    with open(os.path.join(out_dir, "truth.json"), "w") as truth_file:
+        json.dump(truth, truth_file, indent=1)
+    return truth
+
+
+def percentile_ms(values, q):
+    return float(np.percentile(values, q)) if values else None
+
+
+def run_benchmark(img_dir, reader, processor, model, batch_size=1, decode_scale=1, grayscale=False, roi_mode="ink",
+                  name_mode="full", amount_mode="auto", decode="open"):
+    """
+    Runs the check_scan stages over every check in img_dir, timing each stage separately.
+
+    Outputs:
+    - results (dict): Throughput, p50/p95 per-check latency per stage (ms), workbook write time,
+      peak RSS and accuracy against truth.json.
+    """
+    check_files = list_check_files(img_dir)
+    stage_ms = {"decode": [], "names": [], "amount": [], "total": []}
+    records = []
+
+    # The same stage functions check_scan.py runs; names and decode are timed per check by ocr_check_batch,
+    # and the rest of its time (courtesy box and legal line) is charged to the batch's checks evenly
+    run_start = time.perf_counter()
+    for start in range(0, len(check_files), batch_size):
+        batch = check_files[start:start + batch_size]
+        decoded = decode_check_batch(batch, decode_scale, grayscale)
+        stage_start = time.perf_counter()
+        batch_records = ocr_check_batch(batch, decoded, reader, processor, model, batch_size=batch_size,
+                                        roi_mode=roi_mode, name_mode=name_mode, amount_mode=amount_mode, decode=decode)
+        ocr_ms = (time.perf_counter() - stage_start) * 1000
+        amount_ms = (ocr_ms - sum(record["NameMs"] for record in batch_records)) / len(batch)
+
+        for record in batch_records:
+            stage_ms["decode"].append(record["DecodeMs"])
+            stage_ms["names"].append(record["NameMs"])
+            stage_ms["amount"].append(amount_ms)
+            stage_ms["total"].append(record["DecodeMs"] + record["NameMs"] + amount_ms)
+        records.extend(batch_records)
+    ocr_seconds = time.perf_counter() - run_start
+
+    # Workbook write, on a fresh blank workbook
+    report_file = os.path.join(img_dir, "bench_report.xlsx")
+    Workbook().save(report_file)
+    stage_start = time.perf_counter()
+    write_check_report(records, report_file)
+    write_ms = (time.perf_counter() - stage_start) * 1000
+
+    results = {
+        "checks": len(records),
+        "checks_per_sec": len(records) / ocr_seconds if ocr_seconds else None,
+        "latency_ms": {stage: {"p50": percentile_ms(values, 50), "p95": percentile_ms(values, 95),
+                               "mean": float(np.mean(values)) if values else None}
+                       for stage, values in stage_ms.items()},
+        "write_ms": write_ms,
+        "generate_calls_per_check": (sum(record["GenerateCalls"] for record in records) / len(records)) if records else None,
+        "courtesy_share": (sum(record["AmountPath"] == "courtesy" for record in records) / len(records)) if records else None,
+        "mismatch_checks": [record["Check Number"] for record in records if record["AmountPath"] == "mismatch"],
+        "peak_rss_mb": peak_memory_mb(),
+    }
+
+    truth_path = os.path.join(img_dir, "truth.json")
+    if os.path.exists(truth_path) and records:
+        with open(truth_path) as truth_file:
+            truth = json.load(truth_file)
+        known = [record for record in records if record["Check Number"] in truth]
+        results["amount_accuracy"] = sum(
+            record["DonationAmount"] is not None and float(record["DonationAmount"]) == truth[record["Check Number"]]["amount"]
+            for record in known) / len(known)
+        results["names_accuracy"] = sum(
+            (record["Names"] or "").upper() == truth[record["Check Number"]]["names"] for record in known) / len(known)
+    return results
+
+
+def print_results(results):
+    """ Prints a benchmark result as a small table """
+    print(f"Checks: {results['checks']}, {results['checks_per_sec']:.2f} checks/sec, "
+          f"peak RSS {results['peak_rss_mb'] or 0:.0f} MB")
+    print(f"{'stage':<8}{'p50 ms':>10}{'p95 ms':>10}{'mean ms':>10}")
+    for stage, latency in results["latency_ms"].items():
+        print(f"{stage:<8}{latency['p50']:>10.1f}{latency['p95']:>10.1f}{latency['mean']:>10.1f}")
+    print(f"Workbook write: {results['write_ms']:.1f} ms")
+    print(f"Amounts from the courtesy box: {results['courtesy_share']:.1%}, "
+          f"TrOCR generate calls per check: {results['generate_calls_per_check']:.2f}")
+    if results["mismatch_checks"]:
+        print(f"Courtesy box and legal line disagree: {', '.join(results['mismatch_checks'])}")
+    if "amount_accuracy" in results:
+        print(f"Accuracy: amounts {results['amount_accuracy']:.1%}, names {results['names_accuracy']:.1%}")
+
+
+## Execution
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark check_scan.py on synthetic checks (offline)")
+    parser.add_argument('--img_dir', metavar='path', required=True, help='directory of the synthetic checks (generated if empty)')
+    parser.add_argument('--count', type=int, default=50, help='number of synthetic checks to generate')
+    parser.add_argument('--seed', type=int, default=0, help='random seed for the synthetic checks')
+    parser.add_argument('--generate_only', action='store_true', help='only write the synthetic checks')
+    parser.add_argument('--output', metavar='file', default=None, help='write the results as JSON to this file')
+    parser.add_argument('--label', default=None, help='name of this run in the JSON results')
+    parser.add_argument('--batch_size', type=int, default=1, help='checks per batch and ROI crops per TrOCR generate call')
+    parser.add_argument('--decode_scale', type=int, default=1, choices=[1, 2, 4, 8], help='decode check images at 1/N resolution')
+    parser.add_argument('--grayscale', action='store_true', help='decode check images in grayscale')
+    parser.add_argument('--roi_mode', default='ink', choices=['ink', 'sweep'], help='amount line localization')
+    parser.add_argument('--name_mode', default='full', choices=['full', 'fast'], help='name region reading mode')
+    parser.add_argument('--amount_mode', default='auto', choices=['auto', 'legal', 'verify'],
+                        help='courtesy box first, always the legal line, or both with the legal line deciding')
+    parser.add_argument('--decode', default='open', choices=['open', 'numeric'], help='legal line decoding vocabulary')
+    parser.add_argument('--backend', default='torch', choices=BACKENDS, help='TrOCR recognition backend')
+    parser.add_argument('--model_dir', metavar='path', default=None, help='local TrOCR model directory')
+    parser.add_argument('--easyocr_dir', metavar='path', default=EASYOCR_MODEL_DIR, help='local EasyOCR model directory')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.img_dir) or not any(file.endswith("Front.tif") for file in os.listdir(args.img_dir)):
+        print(f"Generating {args.count} synthetic checks in {args.img_dir}...")
+        generate_checks(args.img_dir, args.count, args.seed)
+    if args.generate_only:
+        sys.exit(0)
+
+    print("Loading models...")
+    load_start = time.perf_counter()
+    reader, processor, model = load_models(args.backend, args.model_dir, easyocr_dir=args.easyocr_dir, download_enabled=False)
+    load_seconds = time.perf_counter() - load_start
+
+    results = run_benchmark(args.img_dir, reader, processor, model, batch_size=args.batch_size,
+                            decode_scale=args.decode_scale, grayscale=args.grayscale, roi_mode=args.roi_mode,
+                            name_mode=args.name_mode, amount_mode=args.amount_mode, decode=args.decode)
+    results["model_load_seconds"] = load_seconds
+    results["label"] = args.label
+    results["settings"] = {key: value for key, value in vars(args).items()
+                           if key in ("batch_size", "decode_scale", "grayscale", "roi_mode", "name_mode", "amount_mode", "decode", "backend", "model_dir")}
+    print_results(results)
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=1)
+        print(f"Results written to {args.output}")
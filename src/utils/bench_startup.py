@@ -0,0 +1,72 @@
+## Benchmark: cold start of the cash counting UI (source or PyInstaller build) and of the check scanner's CLI
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Written by cash_count_ui.py once its window is shown (see READY_FILE_ENV there)
+READY_FILE_ENV = "OFFERING_READY_FILE"
+
+
+def time_ui_start(command, timeout):
+    """ Starts the UI and returns the seconds until its window is shown; the UI closes itself afterwards """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        ready_file = os.path.join(temp_dir, "ready")
+        env = dict(os.environ, **{READY_FILE_ENV: ready_file})
+        start = time.time()
+        process = subprocess.Popen(command, env=env, cwd=SRC_DIR)
+        try:
+            while not os.path.exists(ready_file):
+                if process.poll() is not None:
+                    raise RuntimeError(f"{command[-1]} exited with {process.returncode} before its window was shown")
+                if time.time() - start > timeout:
+                    raise TimeoutError(f"{command[-1]} did not show its window within {timeout}s")
+                time.sleep(0.005)
+            process.wait(timeout)
+        finally:
+            if process.poll() is None:
+                process.kill()
+        # The UI records the time the window was shown; an empty read means it is still being written
+        with open(ready_file) as file:
+            shown = file.read().strip()
+        return (float(shown) if shown else time.time()) - start
+
+
+def time_cli_exit(command, timeout):
+    """ Runs a command line to completion and returns its seconds (e.g., an argument error) """
+    start = time.perf_counter()
+    subprocess.run(command, cwd=SRC_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=timeout)
+    return time.perf_counter() - start
+
+
+## Execution
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the startup time of the cash counting UI and the check scanner")
+    parser.add_argument('--exe', metavar='path', default=None,
+                        help='PyInstaller build of the UI (e.g., dist\\cash_count_ui\\cash_count_ui.exe); timed next to the source build')
+    parser.add_argument('--repeat', type=int, default=5, help='starts per target')
+    parser.add_argument('--timeout', type=float, default=120, help='seconds before a start counts as hung')
+    parser.add_argument('--skip_ui', action='store_true', help='only time the check scanner (no display available)')
+    args = parser.parse_args()
+
+    targets = []
+    if not args.skip_ui:
+        targets.append(("cash_count_ui.py (window shown)", time_ui_start, [sys.executable, "cash_count_ui.py"]))
+        if args.exe:
+            targets.append(("frozen UI (window shown)", time_ui_start, [os.path.abspath(args.exe)]))
+    targets.append(("check_scan.py (argument error)", time_cli_exit, [sys.executable, "check_scan.py"]))
+    targets.append(("check_scan.py --help", time_cli_exit, [sys.executable, "check_scan.py", "--help"]))
+    targets.append(("python (interpreter only)", time_cli_exit, [sys.executable, "-c", "pass"]))
+
+    print(f"{'target':<36}{'median s':>10}{'min s':>8}{'max s':>8}")
+    for name, measure, command in targets:
+        # The first start warms the OS file cache and is not counted
+        measure(command, args.timeout)
+        seconds = [measure(command, args.timeout) for _ in range(args.repeat)]
+        print(f"{name:<36}{np.median(seconds):>10.2f}{min(seconds):>8.2f}{max(seconds):>8.2f}")